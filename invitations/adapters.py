@@ -1,19 +1,130 @@
+import functools
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+
+import django
+from asgiref.sync import sync_to_async
+from django.apps import apps
 from django.conf import settings
 from django.contrib import messages
-from django.core.mail import EmailMessage, EmailMultiAlternatives
+from django.core.mail import EmailMessage, EmailMultiAlternatives, get_connection
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 from django.template import TemplateDoesNotExist
-from django.template.loader import render_to_string
+from django.template.loader import get_template
+from django.utils.autoreload import file_changed
 from django.utils.encoding import force_str
 
+from . import metrics, tracing
 from .app_settings import app_settings
 from .utils import import_attribute
 
+# Compiled templates by name, None for templates that don't exist.
+_template_cache = {}
+
+_render_executor_lock = threading.Lock()
+# (pid, processes, executor) of the pool rendering e-mails in parallel.
+_render_executor = None
+
+
+def get_cached_template(template_name):
+    """
+    Returns the compiled template called `template_name`, or ``None`` if it
+    doesn't exist. Lookups, including misses, are cached until a setting or
+    a watched file changes.
+    """
+    try:
+        return _template_cache[template_name]
+    except KeyError:
+        pass
+    try:
+        template = get_template(template_name)
+    except TemplateDoesNotExist:
+        template = None
+    _template_cache[template_name] = template
+    return template
+
+
+@receiver(setting_changed)
+@receiver(file_changed)
+def clear_template_cache(**kwargs):
+    _template_cache.clear()
+
+
+def _setup_render_worker():
+    # Processes that aren't forked start without a configured Django.
+    if not apps.ready:
+        django.setup()
+
+
+def _get_render_executor(processes):
+    global _render_executor
+
+    with _render_executor_lock:
+        # Pools can't be shared with forked processes.
+        if _render_executor is None or _render_executor[:2] != (
+            os.getpid(),
+            processes,
+        ):
+            _shutdown_render_executor()
+            executor = ProcessPoolExecutor(
+                max_workers=processes,
+                initializer=_setup_render_worker,
+            )
+            _render_executor = (os.getpid(), processes, executor)
+        return _render_executor[2]
+
+
+def _shutdown_render_executor():
+    global _render_executor
+
+    if _render_executor is not None:
+        if _render_executor[0] == os.getpid():
+            _render_executor[2].shutdown(wait=False)
+        _render_executor = None
+
+
+@receiver(setting_changed)
+def clear_render_executor(**kwargs):
+    with _render_executor_lock:
+        _shutdown_render_executor()
+
+
+def _render_mails(adapter, mails, instrument=True):
+    results = []
+    for template_prefix, email, context in mails:
+        try:
+            if instrument:
+                with tracing.span("invitations.render_mail"):
+                    with metrics.timer("invitations_render_seconds"):
+                        msg = adapter.render_mail(template_prefix, email, context)
+            else:
+                msg = adapter.render_mail(template_prefix, email, context)
+            results.append(msg)
+        except Exception as exc:
+            results.append(exc)
+    return results
+
 
 # Code credits here to django-allauth
 class BaseInvitationsAdapter:
+    # Smallest number of e-mails rendered in INVITATIONS_RENDER_PROCESSES
+    # processes, smaller batches aren't worth the inter-process overhead.
+    parallel_render_threshold = 200
+
     def stash_verified_email(self, request, email):
         request.session["account_verified_email"] = email
 
+    async def astash_verified_email(self, request, email):
+        aset = getattr(request.session, "aset", None)
+        if aset is None:
+            await sync_to_async(self.stash_verified_email)(request, email)
+        else:
+            await aset("account_verified_email", email)
+
     def unstash_verified_email(self, request):
         ret = request.session.get("account_verified_email")
         request.session["account_verified_email"] = None
@@ -31,20 +142,24 @@ class BaseInvitationsAdapter:
         Renders an e-mail to `email`.  `template_prefix` identifies the
         e-mail that is to be sent, e.g. "account/email/email_confirmation"
         """
-        subject = render_to_string(f"{template_prefix}_subject.txt", context)
+        template_name = f"{template_prefix}_subject.txt"
+        template = get_cached_template(template_name)
+        if template is None:
+            raise TemplateDoesNotExist(template_name)
+        subject = template.render(context)
         # remove superfluous line breaks
         subject = " ".join(subject.splitlines()).strip()
         subject = self.format_email_subject(subject, context)
 
         bodies = {}
         for ext in ["html", "txt"]:
-            try:
-                template_name = f"{template_prefix}_message.{ext}"
-                bodies[ext] = render_to_string(template_name, context).strip()
-            except TemplateDoesNotExist:
-                if ext == "txt" and not bodies:
-                    # We need at least one body
-                    raise
+            template_name = f"{template_prefix}_message.{ext}"
+            template = get_cached_template(template_name)
+            if template is not None:
+                bodies[ext] = template.render(context).strip()
+            elif ext == "txt" and not bodies:
+                # We need at least one body
+                raise TemplateDoesNotExist(template_name)
         if "txt" in bodies:
             msg = EmailMultiAlternatives(
                 subject,
@@ -64,9 +179,102 @@ class BaseInvitationsAdapter:
             msg.content_subtype = "html"  # Main content is now text/html
         return msg
 
+    @tracing.traced("invitations.send_mail")
     def send_mail(self, template_prefix, email, context):
-        msg = self.render_mail(template_prefix, email, context)
-        msg.send()
+        with tracing.span("invitations.render_mail"):
+            with metrics.timer("invitations_render_seconds"):
+                msg = self.render_mail(template_prefix, email, context)
+        with tracing.span("invitations.send_message"):
+            with metrics.timer("invitations_send_seconds"):
+                msg.send()
+
+    async def asend_mail(self, template_prefix, email, context):
+        """
+        Async variant of `send_mail`. Runs `send_mail` in a thread by
+        default, override it to use an async mail client.
+        """
+        await sync_to_async(self.send_mail)(template_prefix, email, context)
+
+    @tracing.traced("invitations.send_mails")
+    def send_mails(self, mails):
+        """
+        Renders and sends many e-mails over a single mail connection.
+        `mails` is a list of ``(template_prefix, email, context)`` tuples.
+
+        Returns a list holding, for every e-mail, ``None`` if it was sent or
+        the exception that prevented it.
+        """
+        results = []
+        msgs = []
+        for rendered in self.render_mails(mails):
+            if isinstance(rendered, Exception):
+                msgs.append(None)
+                results.append(rendered)
+            else:
+                msgs.append(rendered)
+                results.append(None)
+
+        connection = get_connection()
+        try:
+            connection.open()
+        except Exception as exc:
+            return [result or exc for result in results]
+        try:
+            for i, msg in enumerate(msgs):
+                if msg is None:
+                    continue
+                try:
+                    with tracing.span("invitations.send_message"):
+                        with metrics.timer("invitations_send_seconds"):
+                            connection.send_messages([msg])
+                except Exception as exc:
+                    results[i] = exc
+        finally:
+            connection.close()
+        return results
+
+    def render_mails(self, mails):
+        """
+        Renders many e-mails, see `send_mails`. Large batches are rendered
+        in ``INVITATIONS_RENDER_PROCESSES`` processes.
+
+        Returns a list holding, for every e-mail, the message or the
+        exception that prevented rendering it.
+        """
+        processes = app_settings.RENDER_PROCESSES
+        if not processes or len(mails) < self.parallel_render_threshold:
+            return _render_mails(self, mails)
+
+        size = -(-len(mails) // (processes * 4))
+        remaining = iter(mails)
+        chunks = list(iter(lambda: list(islice(remaining, size)), []))
+        results = []
+        # Spans and metrics of the worker processes would be lost, so the
+        # whole stage is traced and timed here instead of each e-mail.
+        with tracing.span("invitations.render_mails", count=len(mails)):
+            with metrics.timer("invitations_parallel_render_seconds"):
+                executor = _get_render_executor(processes)
+                futures = [
+                    executor.submit(_render_mails, self, chunk, False)
+                    for chunk in chunks
+                ]
+                for chunk, future in zip(chunks, futures):
+                    try:
+                        results.extend(future.result())
+                    except BrokenProcessPool as exc:
+                        clear_render_executor()
+                        results.extend([exc] * len(chunk))
+                    except Exception as exc:
+                        # E.g. an unpicklable context or message.
+                        results.extend([exc] * len(chunk))
+        return results
+
+    async def asend_mails(self, mails):
+        """
+        Async variant of `send_mails`. Runs `send_mails` in a thread by
+        default, override it to use an async mail client.
+        """
+        return await sync_to_async(self.send_mails)(mails)
 
     def is_open_for_signup(self, request):
         if hasattr(request, "session") and request.session.get(
@@ -100,14 +308,13 @@ class BaseInvitationsAdapter:
         the message text from a template.
         """
         if "django.contrib.messages" in settings.INSTALLED_APPS:
-            try:
+            template = get_cached_template(message_template)
+            if template is not None:
                 if message_context is None:
                     message_context = {}
-                message = render_to_string(message_template, message_context).strip()
+                message = template.render(message_context).strip()
                 if message:
                     messages.add_message(request, level, message, extra_tags=extra_tags)
-            except TemplateDoesNotExist:
-                pass
 
 
 def get_invitations_adapter():
@@ -123,4 +330,14 @@ def get_invitations_adapter():
         return get_adapter()
     else:
         # load an adapter from elsewhere
-        return import_attribute(app_settings.ADAPTER)()
+        return _get_adapter(app_settings.ADAPTER)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_adapter(path):
+    return import_attribute(path)()
+
+
+@receiver(setting_changed)
+def clear_adapter_cache(**kwargs):
+    _get_adapter.cache_clear()
@@ -1,9 +1,23 @@
-from django.contrib import admin
+from itertools import islice
 
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from django.utils.translation import ngettext
+
+from . import key_filter, state_cache
+from .app_settings import app_settings
+from .keys import generate_key, is_signed_key
+from .models import PendingInvitationEmail
 from .utils import (
     get_invitation_admin_add_form,
     get_invitation_admin_change_form,
     get_invitation_model,
+    normalize_email,
 )
 
 Invitation = get_invitation_model()
@@ -11,10 +25,78 @@ InvitationAdminAddForm = get_invitation_admin_add_form()
 InvitationAdminChangeForm = get_invitation_admin_change_form()
 
 
+class EstimatedCountPaginator(Paginator):
+    """
+    Uses the row estimate of the database statistics instead of
+    ``COUNT(*)`` for unfiltered lists of large tables, on PostgreSQL and
+    MySQL.
+    """
+
+    # Smaller tables are counted exactly.
+    estimate_threshold = 100000
+
+    @cached_property
+    def count(self):
+        query = getattr(self.object_list, "query", None)
+        if query is not None and not query.where:
+            estimate = self.get_estimated_count()
+            if estimate is not None and estimate > self.estimate_threshold:
+                return estimate
+        return super().count
+
+    def get_estimated_count(self):
+        connection = connections[self.object_list.db]
+        table = self.object_list.model._meta.db_table
+        if connection.vendor == "postgresql":
+            sql = "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass"
+            params = [connection.ops.quote_name(table)]
+        elif connection.vendor == "mysql":
+            sql = (
+                "SELECT table_rows FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name = %s"
+            )
+            params = [table]
+        else:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            row = cursor.fetchone()
+        return row[0] if row else None
+
+
+class ExpiredListFilter(admin.SimpleListFilter):
+    title = _("expired")
+    parameter_name = "expired"
+
+    def lookups(self, request, model_admin):
+        return (("1", _("Yes")), ("0", _("No")))
+
+    def queryset(self, request, queryset):
+        threshold = Invitation.objects.sent_threshold()
+        # Both branches match the partial index on pending invitations.
+        if self.value() == "1":
+            return queryset.filter(accepted=False, sent__lt=threshold)
+        if self.value() == "0":
+            return queryset.filter(
+                Q(sent__gte=threshold) | Q(sent__isnull=True),
+                accepted=False,
+            )
+        return queryset
+
+
 @admin.register(Invitation)
 class InvitationAdmin(admin.ModelAdmin):
-    list_display = ("email", "sent", "accepted")
+    list_display = ("email", "inviter", "sent", "accepted")
+    list_filter = ("accepted", ExpiredListFilter)
+    list_select_related = ("inviter",)
+    search_fields = ("normalized_email",)
+    search_help_text = _("Addresses starting with the search term.")
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
     autocomplete_fields = ["inviter"]
+    actions = ["resend_invitations", "expire_invitations"]
+    # Number of invitations sent per mail connection by resend_invitations.
+    resend_batch_size = 500
 
     def get_form(self, request, obj=None, **kwargs):
         if obj:
@@ -24,3 +106,88 @@ class InvitationAdmin(admin.ModelAdmin):
             kwargs["form"].user = request.user
             kwargs["form"].request = request
         return super().get_form(request, obj, **kwargs)
+
+    def get_search_results(self, request, queryset, search_term):
+        # A case sensitive prefix match on the normalized address can use
+        # its unique index.
+        search_term = normalize_email(search_term)
+        if not search_term:
+            return queryset, False
+        return queryset.filter(normalized_email__startswith=search_term), False
+
+    def delete_queryset(self, request, queryset):
+        keys = list(queryset.values_list("key", flat=True))
+        super().delete_queryset(request, queryset)
+        state_cache.invalidate(*keys)
+
+    @admin.action(description=_("Resend selected invitations"))
+    def resend_invitations(self, request, queryset):
+        invitations = (
+            queryset.filter(accepted=False)
+            .select_related("inviter")
+            .iterator(chunk_size=self.resend_batch_size)
+        )
+        sent = failed = 0
+        while batch := list(islice(invitations, self.resend_batch_size)):
+            self._reissue_signed_keys(batch)
+            errors = Invitation.send_invitations(batch, request)
+            failed += sum(error is not None for error in errors)
+            sent += len(batch)
+        self.message_user(
+            request,
+            ngettext(
+                "Resent %(count)d invitation.",
+                "Resent %(count)d invitations.",
+                sent - failed,
+            )
+            % {"count": sent - failed},
+            messages.SUCCESS,
+        )
+        if failed:
+            self.message_user(
+                request,
+                ngettext(
+                    "%(count)d invitation could not be sent.",
+                    "%(count)d invitations could not be sent.",
+                    failed,
+                )
+                % {"count": failed},
+                messages.ERROR,
+            )
+
+    def _reissue_signed_keys(self, invitations):
+        # Signed keys embed their issue time, so resending them would send
+        # links expiring with the first e-mail.
+        reissued = [
+            invitation for invitation in invitations if is_signed_key(invitation.key)
+        ]
+        if not reissued:
+            return
+        old_keys = [invitation.key for invitation in reissued]
+        for invitation in reissued:
+            invitation.key = generate_key()
+        new_keys = [invitation.key for invitation in reissued]
+        key_filter.add_keys(*new_keys)
+        Invitation._default_manager.bulk_update(reissued, ["key"])
+        # E-mails queued with the old keys are superseded by the new ones.
+        PendingInvitationEmail.objects.filter(invitation__in=reissued).delete()
+        state_cache.invalidate(*old_keys, *new_keys)
+
+    @admin.action(description=_("Expire selected invitations"))
+    def expire_invitations(self, request, queryset):
+        queryset = queryset.filter(accepted=False)
+        keys = list(queryset.values_list("key", flat=True))
+        count = queryset.update(
+            sent=timezone.now() - app_settings.INVITATION_EXPIRY_DELTA,
+        )
+        state_cache.invalidate(*keys)
+        self.message_user(
+            request,
+            ngettext(
+                "Expired %(count)d invitation.",
+                "Expired %(count)d invitations.",
+                count,
+            )
+            % {"count": count},
+            messages.SUCCESS,
+        )
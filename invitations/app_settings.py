@@ -1,34 +1,61 @@
+from datetime import timedelta
+
 from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.urls import NoReverseMatch, reverse
+from django.utils.functional import cached_property
 
 
 class AppSettings:
+    """
+    Settings are resolved once on first access and then read as plain
+    attributes, until `reload` drops them on a settings change.
+    """
+
     def __init__(self, prefix):
         self.prefix = prefix
 
     def _setting(self, name, dflt):
         return getattr(settings, self.prefix + name, dflt)
 
-    @property
+    def _resolve_url(self, url):
+        try:
+            return reverse(url)
+        except NoReverseMatch:
+            return url
+
+    def reload(self):
+        for name, attr in vars(type(self)).items():
+            if isinstance(attr, cached_property):
+                self.__dict__.pop(name, None)
+
+    @cached_property
     def INVITATION_EXPIRY(self):
         """How long before the invitation expires"""
         return self._setting("INVITATION_EXPIRY", 3)
 
-    @property
+    @cached_property
+    def INVITATION_EXPIRY_DELTA(self):
+        """INVITATION_EXPIRY as a timedelta"""
+        return timedelta(days=self.INVITATION_EXPIRY)
+
+    @cached_property
     def INVITATION_ONLY(self):
         """Signup is invite only"""
         return self._setting("INVITATION_ONLY", False)
 
-    @property
+    @cached_property
     def CONFIRM_INVITE_ON_GET(self):
         """Simple get request confirms invite"""
         return self._setting("CONFIRM_INVITE_ON_GET", True)
 
-    @property
+    @cached_property
     def ACCEPT_INVITE_AFTER_SIGNUP(self):
         """Accept the invitation after the user finished signup."""
         return self._setting("ACCEPT_INVITE_AFTER_SIGNUP", False)
 
-    @property
+    @cached_property
     def GONE_ON_ACCEPT_ERROR(self):
         """
         If an invalid/expired/previously accepted key is provided, return a
@@ -36,55 +63,78 @@ class AppSettings:
         """
         return self._setting("GONE_ON_ACCEPT_ERROR", True)
 
-    @property
+    @cached_property
     def ALLOW_JSON_INVITES(self):
         """Exposes json endpoint for mass invite creation"""
         return self._setting("ALLOW_JSON_INVITES", False)
 
-    @property
+    @cached_property
+    def JSON_MAX_PAYLOAD_SIZE(self):
+        """Largest body in bytes accepted by the JSON invite endpoint"""
+        return self._setting(
+            "JSON_MAX_PAYLOAD_SIZE",
+            settings.DATA_UPLOAD_MAX_MEMORY_SIZE,
+        )
+
+    @cached_property
+    def JSON_CODEC(self):
+        """Module providing loads and dumps for the JSON invite endpoint"""
+        return self._setting("JSON_CODEC", "json")
+
+    @cached_property
     def SIGNUP_REDIRECT(self):
         """Where to redirect on email confirm of invite"""
         return self._setting("SIGNUP_REDIRECT", "account_signup")
 
-    @property
+    @cached_property
+    def SIGNUP_REDIRECT_URL(self):
+        """SIGNUP_REDIRECT reversed if it is a URL name"""
+        return self._resolve_url(self.SIGNUP_REDIRECT)
+
+    @cached_property
     def LOGIN_REDIRECT(self):
         """Where to redirect on an expired or already accepted invite"""
         return self._setting("LOGIN_REDIRECT", settings.LOGIN_URL)
 
-    @property
+    @cached_property
+    def LOGIN_REDIRECT_URL(self):
+        """LOGIN_REDIRECT reversed if it is a URL name"""
+        return self._resolve_url(self.LOGIN_REDIRECT)
+
+    @cached_property
     def ADAPTER(self):
         """The adapter, setting ACCOUNT_ADAPTER overrides this default"""
         return self._setting("ADAPTER", "invitations.adapters.BaseInvitationsAdapter")
 
-    @property
+    @cached_property
     def EMAIL_MAX_LENGTH(self):
         """
         Adjust max_length of e-mail addresses
         """
         return self._setting("EMAIL_MAX_LENGTH", 254)
 
-    @property
+    @cached_property
     def EMAIL_SUBJECT_PREFIX(self):
         """
         Subject-line prefix to use for email messages sent
         """
         return self._setting("EMAIL_SUBJECT_PREFIX", None)
 
-    @property
+    @cached_property
     def INVITATION_MODEL(self):
         """
         Subject-line prefix to use for Invitation model setup
         """
         return self._setting("INVITATION_MODEL", "invitations.Invitation")
 
-    @property
+    @cached_property
     def INVITE_FORM(self):
         """
         Form class used for sending invites outside admin.
         """
         return self._setting("INVITE_FORM", "invitations.forms.InviteForm")
 
-    @property
+    @cached_property
     def ADMIN_ADD_FORM(self):
         """
         Form class used for sending invites in admin.
@@ -94,7 +144,7 @@ class AppSettings:
             "invitations.forms.InvitationAdminAddForm",
         )
 
-    @property
+    @cached_property
     def ADMIN_CHANGE_FORM(self):
         """
         Form class used for updating invitations in admin.
@@ -104,9 +154,124 @@ class AppSettings:
             "invitations.forms.InvitationAdminChangeForm",
         )
 
-    @property
+    @cached_property
+    def RATE_LIMIT_CACHE(self):
+        """Cache holding the rate limit token buckets"""
+        return self._setting("RATE_LIMIT_CACHE", "default")
+
+    @cached_property
+    def INVITER_RATE(self):
+        """Invitations per second an inviter may send, None for no limit"""
+        return self._setting("INVITER_RATE", None)
+
+    @cached_property
+    def INVITER_BURST(self):
+        """Invitations an inviter may send at once"""
+        return self._setting("INVITER_BURST", 100)
+
+    @cached_property
+    def GLOBAL_RATE(self):
+        """Invitations per second the site may send, None for no limit"""
+        return self._setting("GLOBAL_RATE", None)
+
+    @cached_property
+    def GLOBAL_BURST(self):
+        """Invitations the site may send at once"""
+        return self._setting("GLOBAL_BURST", 1000)
+
+    @cached_property
+    def RENDER_PROCESSES(self):
+        """Number of processes rendering large batches of e-mails"""
+        return self._setting("RENDER_PROCESSES", None)
+
+    @cached_property
+    def USE_EMAIL_OUTBOX(self):
+        """
+        Queue invitation e-mails in the database instead of sending them
+        during the request
+        """
+        return self._setting("USE_EMAIL_OUTBOX", False)
+
+    @cached_property
+    def DEFAULT_HTTP_PROTOCOL(self):
+        """Protocol of invite URLs built outside of a request"""
+        return self._setting("DEFAULT_HTTP_PROTOCOL", "https")
+
+    @cached_property
+    def ASYNC_VIEWS(self):
+        """Route the invitation URLs to the async views"""
+        return self._setting("ASYNC_VIEWS", False)
+
+    @cached_property
+    def SIGNED_KEYS(self):
+        """
+        Issue keys embedding their issue time and an HMAC tag, which can be
+        checked without a database query
+        """
+        return self._setting("SIGNED_KEYS", False)
+
+    @cached_property
+    def KEY_FILTER_PATH(self):
+        """
+        File holding the filter of issued keys used to reject unknown keys
+        without a database query, None disables it
+        """
+        return self._setting("KEY_FILTER_PATH", None)
+
+    @cached_property
+    def KEY_FILTER_ERROR_RATE(self):
+        """False positive rate the key filter is sized for"""
+        return self._setting("KEY_FILTER_ERROR_RATE", 0.001)
+
+    @cached_property
+    def KEY_FILTER_CACHE(self):
+        """Alias of the cache remembering keys issued since the last build"""
+        return self._setting("KEY_FILTER_CACHE", "default")
+
+    @cached_property
+    def KEY_FILTER_MAX_AGE(self):
+        """Seconds after which a key filter that wasn't rebuilt is ignored"""
+        return self._setting("KEY_FILTER_MAX_AGE", 86400)
+
+    @cached_property
+    def STATE_CACHE(self):
+        """
+        Alias of the cache storing invitation states for AcceptInvite, None
+        disables it
+        """
+        return self._setting("STATE_CACHE", None)
+
+    @cached_property
+    def STATE_CACHE_TIMEOUT(self):
+        """Seconds an invitation state stays cached"""
+        return self._setting("STATE_CACHE_TIMEOUT", 300)
+
+    @cached_property
+    def STATE_CACHE_UNKNOWN_TIMEOUT(self):
+        """Seconds a key without invitation stays cached"""
+        return self._setting("STATE_CACHE_UNKNOWN_TIMEOUT", 30)
+
+    @cached_property
+    def METRICS_COLLECTOR(self):
+        """
+        Path of the class collecting invitation metrics, None disables
+        metrics
+        """
+        return self._setting("METRICS_COLLECTOR", None)
+
+    @cached_property
+    def TRACER(self):
+        """Path of the class tracing invitation code paths, None disables it"""
+        return self._setting("TRACER", None)
+
+    @cached_property
     def CONFIRMATION_URL_NAME(self):
         return self._setting("CONFIRMATION_URL_NAME", "invitations:accept-invite")
 
 
 app_settings = AppSettings("INVITATIONS_")
+
+
+@receiver(setting_changed)
+def reload_app_settings(**kwargs):
+    app_settings.reload()
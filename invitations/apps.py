@@ -1,4 +1,5 @@
 from django.apps import AppConfig
+from django.core import checks
 
 
 class Config(AppConfig):
@@ -7,3 +8,9 @@ class Config(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "invitations"
     label = "invitations"
+
+    def ready(self):
+        from .checks import check_invitation_model, check_key_filter_cache
+
+        checks.register(check_invitation_model)
+        checks.register(check_key_filter_cache)
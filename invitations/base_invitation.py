@@ -2,6 +2,7 @@ from django.conf import settings
 from django.db import models
 from django.utils.translation import gettext_lazy as _
 
+from . import metrics, state_cache
 from .managers import BaseInvitationManager
 
 
@@ -31,6 +32,40 @@ class AbstractBaseInvitation(models.Model):
     def key_expired(self):
         raise NotImplementedError("You should implement the key_expired method")
 
+    def accept(self):
+        """
+        Marks the invitation as accepted with one conditional UPDATE.
+
+        Returns whether this call accepted it: ``False`` if it was already
+        accepted, e.g. by a concurrent request, or has expired.
+        """
+        accepted = self._get_accept_queryset().update(accepted=True) == 1
+        if accepted:
+            self.accepted = True
+            state_cache.invalidate(self.key)
+            metrics.increment("invitations_accepted_total")
+        return accepted
+
+    async def aaccept(self):
+        """
+        Async variant of `accept`.
+        """
+        accepted = await self._get_accept_queryset().aupdate(accepted=True) == 1
+        if accepted:
+            self.accepted = True
+            state_cache.invalidate(self.key)
+            metrics.increment("invitations_accepted_total")
+        return accepted
+
+    def _get_accept_queryset(self):
+        # Multi-table inherited models are updated through the model
+        # holding the fields, so the UPDATE stays a single statement.
+        model = self._meta.get_field("accepted").model
+        return model._base_manager.filter(
+            type(self)._default_manager.valid_q(),
+            pk=self.pk,
+        )
+
     def send_invitation(self, request, **kwargs):
         raise NotImplementedError("You should implement the send_invitation method")
 
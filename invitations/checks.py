@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.core import checks
+from django.core.exceptions import FieldDoesNotExist
+
+from .app_settings import app_settings
+from .utils import get_invitation_model
+
+# Caches that aren't shared by the processes serving the accept view.
+PROCESS_LOCAL_CACHES = (
+    "django.core.cache.backends.dummy.DummyCache",
+    "django.core.cache.backends.locmem.LocMemCache",
+)
+
+
+def check_key_filter_cache(app_configs, **kwargs):
+    if app_settings.KEY_FILTER_PATH is None:
+        return []
+    alias = app_settings.KEY_FILTER_CACHE
+    backend = settings.CACHES.get(alias, {}).get("BACKEND")
+    if backend not in PROCESS_LOCAL_CACHES:
+        return []
+    return [
+        checks.Warning(
+            f"The {alias!r} cache used by the invitation key filter isn't "
+            "shared between processes, so the filter won't reject any key.",
+            hint="Set INVITATIONS_KEY_FILTER_CACHE to a cache shared by all "
+            "processes, such as Redis or Memcached.",
+            id="invitations.W001",
+        ),
+    ]
+
+
+def check_invitation_model(app_configs, **kwargs):
+    model = get_invitation_model()
+    try:
+        model._meta.get_field("normalized_email")
+    except FieldDoesNotExist:
+        return [
+            checks.Error(
+                f"{model._meta.label} has no normalized_email field.",
+                hint="Add a unique normalized_email field set to "
+                "invitations.utils.normalize_email(self.email) on save, see "
+                "INVITATIONS_INVITATION_MODEL.",
+                obj=model,
+                id="invitations.E001",
+            ),
+        ]
+    return []
@@ -14,3 +14,21 @@ class UserRegisteredEmail(Exception):
     """This email is already registered by a site user"""
 
     pass
+
+
+class TooManyInvitations(Exception):
+    """More invitations were requested at once than the rate limit allows"""
+
+    def __init__(self, limit):
+        super().__init__(limit)
+        # Largest number of invitations that can be sent at once.
+        self.limit = limit
+
+
+class RateLimited(Exception):
+    """The inviter or the site has sent too many invitations"""
+
+    def __init__(self, retry_after):
+        super().__init__(retry_after)
+        # Seconds until enough invitations can be sent again.
+        self.retry_after = retry_after
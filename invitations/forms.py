@@ -1,24 +1,103 @@
+from collections import Counter
+
 from django import forms
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.functions import Lower
 from django.utils.translation import gettext_lazy as _
 
+from . import metrics, tracing
 from .adapters import get_invitations_adapter
 from .exceptions import AlreadyAccepted, AlreadyInvited, UserRegisteredEmail
-from .utils import get_invitation_model
+from .utils import get_invitation_model, normalize_email
 
 Invitation = get_invitation_model()
 
+# Metric labels of the validation errors.
+REJECTION_REASONS = {
+    AlreadyInvited: "pending",
+    AlreadyAccepted: "accepted",
+    UserRegisteredEmail: "registered",
+}
+
 
 class CleanEmailMixin:
+    @tracing.traced("invitations.validate_invitations")
+    def validate_invitations(self, emails):
+        """
+        Validates many addresses at once with a constant number of queries.
+
+        Returns a dict mapping each address in `emails` to ``True`` or to the
+        exception class `validate_invitation` would raise for it.
+        """
+        normalized = {email: normalize_email(email) for email in emails}
+        pending, accepted, registered = self._get_status_querysets(normalized)
+        return self._get_statuses(
+            normalized,
+            set(pending),
+            set(accepted),
+            set(registered),
+        )
+
+    @tracing.traced("invitations.validate_invitations")
+    async def avalidate_invitations(self, emails):
+        """
+        Async variant of `validate_invitations`.
+        """
+        normalized = {email: normalize_email(email) for email in emails}
+        pending, accepted, registered = self._get_status_querysets(normalized)
+        return self._get_statuses(
+            normalized,
+            {email async for email in pending},
+            {email async for email in accepted},
+            {email async for email in registered},
+        )
+
+    def _get_status_querysets(self, normalized):
+        lookup = set(normalized.values())
+        invitations = Invitation.objects.filter(normalized_email__in=lookup)
+        pending = invitations.filter(Invitation.objects.valid_q()).values_list(
+            "normalized_email",
+            flat=True,
+        )
+        accepted = invitations.filter(accepted=True).values_list(
+            "normalized_email",
+            flat=True,
+        )
+        registered = (
+            get_user_model()
+            .objects.annotate(email_lower=Lower("email"))
+            .filter(email_lower__in=lookup)
+            .values_list("email_lower", flat=True)
+        )
+        return pending, accepted, registered
+
+    def _get_statuses(self, normalized, pending, accepted, registered):
+        results = {}
+        for email, email_lower in normalized.items():
+            if email_lower in pending:
+                results[email] = AlreadyInvited
+            elif email_lower in accepted:
+                results[email] = AlreadyAccepted
+            elif email_lower in registered:
+                results[email] = UserRegisteredEmail
+            else:
+                results[email] = True
+        rejected = Counter(result for result in results.values() if result is not True)
+        for status, count in rejected.items():
+            metrics.increment(
+                "invitations_rejected_total",
+                count,
+                stage="invite",
+                reason=REJECTION_REASONS[status],
+            )
+        return results
+
     def validate_invitation(self, email):
-        if Invitation.objects.all_valid().filter(email__iexact=email, accepted=False):
-            raise AlreadyInvited
-        elif Invitation.objects.filter(email__iexact=email, accepted=True):
-            raise AlreadyAccepted
-        elif get_user_model().objects.filter(email__iexact=email):
-            raise UserRegisteredEmail
-        else:
-            return True
+        result = self.validate_invitations([email])[email]
+        if result is not True:
+            raise result
+        return True
 
     def clean_email(self):
         email = self.cleaned_data["email"]
@@ -50,8 +129,11 @@ class InviteForm(forms.Form, CleanEmailMixin):
         initial="",
     )
 
-    def save(self, email):
-        return Invitation.create(email=email)
+    def save(self, email, inviter=None):
+        return Invitation.create(email=email, inviter=inviter)
+
+    async def asave(self, email, inviter=None):
+        return await Invitation.acreate(email=email, inviter=inviter)
 
 
 class InvitationAdminAddForm(forms.ModelForm, CleanEmailMixin):
@@ -67,9 +149,10 @@ class InvitationAdminAddForm(forms.ModelForm, CleanEmailMixin):
         params = {"email": email}
         if cleaned_data.get("inviter"):
             params["inviter"] = cleaned_data.get("inviter")
-        instance = Invitation.create(**params)
-        instance.send_invitation(self.request)
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            instance = Invitation.create(**params)
+            instance.send_invitation(self.request)
+            super().save(*args, **kwargs)
         return instance
 
     class Meta:
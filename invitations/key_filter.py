@@ -0,0 +1,170 @@
+import hashlib
+import math
+import os
+import struct
+import tempfile
+import threading
+import time
+
+from django.core.cache import caches
+
+from .app_settings import app_settings
+
+_HEADER = struct.Struct("<4sQIQ")
+_MAGIC = b"IKBF"
+# Cache key holding the build time of the last filter built, telling that
+# the cache has kept the keys created since then.
+_BUILT_AT_CACHE_KEY = "invitations:key-filter:built-at"
+
+_lock = threading.Lock()
+# (path, mtime, filter) of the filter loaded in this process.
+_loaded = None
+
+
+class BloomFilter:
+    """
+    Probabilistic set of invitation keys. Membership tests can return false
+    positives, at the rate the filter was sized for, but never false
+    negatives.
+    """
+
+    def __init__(self, size, hash_count, bits=None, built_at=None):
+        self.size = size
+        self.hash_count = hash_count
+        self.bits = bytearray(bits) if bits is not None else bytearray(-(-size // 8))
+        self.built_at = int(time.time()) if built_at is None else built_at
+
+    @classmethod
+    def for_capacity(cls, capacity, error_rate):
+        capacity = max(capacity, 1)
+        size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        hash_count = max(1, round(size / capacity * math.log(2)))
+        return cls(size, hash_count)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", digest)
+        return ((h1 + i * h2) % self.size for i in range(self.hash_count))
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(key)
+        )
+
+    def to_bytes(self):
+        header = _HEADER.pack(_MAGIC, self.size, self.hash_count, self.built_at)
+        return header + bytes(self.bits)
+
+    @classmethod
+    def from_bytes(cls, data):
+        magic, size, hash_count, built_at = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError("Not an invitation key filter")
+        offset = _HEADER.size
+        if len(data) - offset != -(-size // 8):
+            raise ValueError("Truncated invitation key filter")
+        return cls(size, hash_count, data[offset:], built_at)
+
+
+def build_key_filter(keys, count, path):
+    """
+    Writes a filter sized for twice `count` keys, with room for keys added
+    until the next build, containing all `keys` to `path`.
+    """
+    key_filter = BloomFilter.for_capacity(
+        max(count * 2, 1000),
+        app_settings.KEY_FILTER_ERROR_RATE,
+    )
+    for key in keys:
+        key_filter.add(key)
+    directory = os.path.dirname(os.path.abspath(path))
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False) as f:
+        f.write(key_filter.to_bytes())
+    # Temporary files are only readable by their owner, and the web workers
+    # may run as another user.
+    umask = os.umask(0)
+    os.umask(umask)
+    os.chmod(f.name, 0o666 & ~umask)
+    os.replace(f.name, path)
+    caches[app_settings.KEY_FILTER_CACHE].set(
+        _BUILT_AT_CACHE_KEY,
+        key_filter.built_at,
+        app_settings.KEY_FILTER_MAX_AGE,
+    )
+    return key_filter
+
+
+def _get_key_filter():
+    global _loaded
+
+    path = app_settings.KEY_FILTER_PATH
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        return None
+    loaded = _loaded
+    if loaded is None or loaded[:2] != (path, mtime):
+        with _lock:
+            # Unreadable or corrupt filters are ignored, keys are then
+            # looked up in the database.
+            try:
+                with open(path, "rb") as f:
+                    key_filter = BloomFilter.from_bytes(f.read())
+            except (OSError, ValueError, struct.error):
+                return None
+            _loaded = loaded = (path, mtime, key_filter)
+    key_filter = loaded[2]
+    # Keys created by other processes are only remembered in the cache for
+    # KEY_FILTER_MAX_AGE, so an older filter could miss some of them.
+    if time.time() - key_filter.built_at > app_settings.KEY_FILTER_MAX_AGE:
+        return None
+    return key_filter
+
+
+def _cache_key(key):
+    return f"invitations:key-filter:{key}"
+
+
+def might_exist(key):
+    """
+    Returns ``False`` only if no invitation can have `key`. Always ``True``
+    when ``INVITATIONS_KEY_FILTER_PATH`` is unset, its filter is missing or
+    stale, or the cache may have lost keys created since it was built.
+    """
+    if app_settings.KEY_FILTER_PATH is None:
+        return True
+    key_filter = _get_key_filter()
+    if key_filter is None or key in key_filter:
+        return True
+    # Created since the filter was built? The cache is only trusted to know
+    # if it was written by the build, which it would have lost when cleared
+    # or if it isn't shared by all processes.
+    cache_key = _cache_key(key)
+    found = caches[app_settings.KEY_FILTER_CACHE].get_many(
+        [cache_key, _BUILT_AT_CACHE_KEY],
+    )
+    if found.get(cache_key):
+        return True
+    return found.get(_BUILT_AT_CACHE_KEY) != key_filter.built_at
+
+
+def add_keys(*keys):
+    """
+    Makes newly issued `keys` pass `might_exist` in every process until the
+    filter is rebuilt.
+    """
+    if app_settings.KEY_FILTER_PATH is None or not keys:
+        return
+    caches[app_settings.KEY_FILTER_CACHE].set_many(
+        {_cache_key(key): True for key in keys},
+        app_settings.KEY_FILTER_MAX_AGE,
+    )
+    key_filter = _get_key_filter()
+    if key_filter is not None:
+        for key in keys:
+            key_filter.add(key)
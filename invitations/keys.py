@@ -0,0 +1,48 @@
+from django.core import signing
+from django.utils.crypto import get_random_string
+
+from .app_settings import app_settings
+
+SIGNED_KEY_SEP = "."
+
+
+def _signer():
+    return signing.TimestampSigner(salt="invitations.key", sep=SIGNED_KEY_SEP)
+
+
+def generate_key():
+    """
+    Returns a new invitation key. With ``INVITATIONS_SIGNED_KEYS`` the key
+    embeds its issue time and an HMAC tag, otherwise it is 64 random
+    characters.
+    """
+    if app_settings.SIGNED_KEYS:
+        # 12 random characters, a 6 character timestamp and a 43 character
+        # tag fit the 64 characters of Invitation.key.
+        return _signer().sign(get_random_string(12))
+    return get_random_string(64).lower()
+
+
+def is_signed_key(key):
+    return SIGNED_KEY_SEP in key
+
+
+def check_signed_key(key):
+    """
+    Raises ``signing.BadSignature`` if the signed `key` was tampered with or
+    is malformed, and ``signing.SignatureExpired`` if it was issued more
+    than ``INVITATIONS_INVITATION_EXPIRY`` days ago.
+    """
+    _signer().unsign(key, max_age=app_settings.INVITATION_EXPIRY_DELTA)
+
+
+def signed_key_expired(key):
+    if not is_signed_key(key):
+        return False
+    try:
+        check_signed_key(key)
+    except signing.SignatureExpired:
+        return True
+    except signing.BadSignature:
+        return False
+    return False
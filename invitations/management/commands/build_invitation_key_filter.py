@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from ...app_settings import app_settings
+from ...key_filter import build_key_filter
+from ...utils import get_invitation_model
+
+Invitation = get_invitation_model()
+
+
+class Command(BaseCommand):
+    help = "Builds the filter of issued invitation keys used by the accept view."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--path",
+            default=app_settings.KEY_FILTER_PATH,
+            help="File to write the filter to, INVITATIONS_KEY_FILTER_PATH "
+            "by default.",
+        )
+
+    def handle(self, *args, **options):
+        if not options["path"]:
+            raise CommandError("Set INVITATIONS_KEY_FILTER_PATH or pass --path.")
+        keys = Invitation.objects.values_list("key", flat=True)
+        key_filter = build_key_filter(
+            keys.iterator(chunk_size=10000),
+            keys.count(),
+            options["path"],
+        )
+        self.stdout.write(
+            f"Wrote a {len(key_filter.bits)} byte filter to {options['path']}.",
+        )
@@ -6,5 +6,48 @@ Invitation = get_invitation_model()
 
 
 class Command(BaseCommand):
+    help = "Deletes expired and accepted invitations in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of invitations deleted per transaction.",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0,
+            help="Seconds to pause between batches.",
+        )
+        parser.add_argument(
+            "--max-rows",
+            type=int,
+            default=None,
+            help="Stop after deleting this many invitations.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report how many invitations would be deleted.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Number of threads deleting disjoint id ranges in parallel.",
+        )
+
     def handle(self, *args, **options):
-        Invitation.objects.delete_expired_confirmations()
+        count = Invitation.objects.delete_expired_confirmations(
+            batch_size=options["batch_size"],
+            sleep=options["sleep"],
+            max_rows=options["max_rows"],
+            dry_run=options["dry_run"],
+            workers=options["workers"],
+        )
+        if options["dry_run"]:
+            self.stdout.write(f"{count} invitations would be deleted.")
+        else:
+            self.stdout.write(f"Deleted {count} invitations.")
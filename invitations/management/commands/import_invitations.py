@@ -0,0 +1,200 @@
+import csv
+import os
+import time
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import validate_email
+
+from ...app_settings import app_settings
+from ...managers import INVITATION_CREATED, INVITATION_PENDING
+from ...models import PendingInvitationEmail
+from ...utils import get_invitation_model, get_json_codec
+
+Invitation = get_invitation_model()
+
+FORMATS = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+
+class Command(BaseCommand):
+    help = "Invites the addresses of a CSV or NDJSON file in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or NDJSON file to import.")
+        parser.add_argument(
+            "--format",
+            choices=["csv", "ndjson"],
+            help="Format of the file, guessed from its extension by default.",
+        )
+        parser.add_argument(
+            "--column",
+            default="email",
+            help="CSV column or NDJSON object key holding the address.",
+        )
+        parser.add_argument(
+            "--inviter",
+            help="Username of the user the invitations are sent by.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of addresses validated and created per batch.",
+        )
+        parser.add_argument(
+            "--start-line",
+            type=int,
+            default=1,
+            help="Skip the records ending before this line, to resume an "
+            "interrupted import.",
+        )
+        parser.add_argument(
+            "--send",
+            action="store_true",
+            help="Send the new invitations, over one mail connection per batch.",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would be imported.",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        file_format = options["format"]
+        if file_format is None:
+            file_format = FORMATS.get(os.path.splitext(path)[1].lower())
+            if file_format is None:
+                raise CommandError("Unknown file extension, pass --format.")
+        inviter = None
+        if options["inviter"]:
+            try:
+                inviter = get_user_model()._default_manager.get_by_natural_key(
+                    options["inviter"],
+                )
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No user named {options['inviter']!r}.")
+
+        totals = dict.fromkeys(["created", "skipped", "invalid", "failed"], 0)
+        started = time.monotonic()
+        line = options["start_line"] - 1
+        # utf-8-sig drops the byte order mark of spreadsheet exports.
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            if file_format == "csv":
+                records = self.read_csv(f, options["column"])
+            else:
+                records = self.read_ndjson(f, options["column"])
+            records = (
+                (line, email)
+                for line, email in records
+                if line >= options["start_line"]
+            )
+            while batch := list(islice(records, options["batch_size"])):
+                counts = self.import_batch(batch, inviter, options)
+                for name, count in counts.items():
+                    totals[name] += count
+                line = batch[-1][0]
+                elapsed = time.monotonic() - started
+                processed = totals["created"] + totals["skipped"] + totals["invalid"]
+                rate = processed / elapsed if elapsed else 0
+                self.stdout.write(
+                    f"Line {line}: {counts['created']} created, "
+                    f"{counts['skipped']} skipped, {counts['invalid']} invalid, "
+                    f"{counts['failed']} failed ({rate:.0f} addresses/s).",
+                )
+
+        verb = "would be created" if options["dry_run"] else "created"
+        self.stdout.write(
+            f"{totals['created']} invitations {verb}, {totals['skipped']} "
+            f"skipped, {totals['invalid']} invalid, {totals['failed']} failed "
+            f"up to line {line} in {time.monotonic() - started:.1f}s.",
+        )
+
+    def read_csv(self, f, column):
+        reader = csv.DictReader(f)
+        if reader.fieldnames is None or column not in reader.fieldnames:
+            raise CommandError(f"No {column!r} column in the CSV header.")
+        for row in reader:
+            yield reader.line_num, row[column]
+
+    def read_ndjson(self, f, column):
+        codec = get_json_codec()
+        for line, data in enumerate(f, 1):
+            if not data.strip():
+                continue
+            try:
+                data = codec.loads(data)
+            except ValueError:
+                data = None
+            if isinstance(data, dict):
+                data = data.get(column)
+            yield line, data
+
+    def import_batch(self, batch, inviter, options):
+        counts = dict.fromkeys(["created", "skipped", "invalid", "failed"], 0)
+        emails = []
+        for line, email in batch:
+            try:
+                if not isinstance(email, str):
+                    raise ValidationError("Not an address")
+                email = email.strip()
+                validate_email(email)
+            except ValidationError:
+                counts["invalid"] += 1
+                self.stderr.write(f"Line {line}: invalid address {email!r}.")
+            else:
+                emails.append(email)
+
+        results, created = Invitation.bulk_create_invitations(
+            emails,
+            inviter=inviter,
+            batch_size=options["batch_size"],
+            dry_run=options["dry_run"],
+            return_invitations=True,
+        )
+        counts["created"] = sum(
+            status == INVITATION_CREATED for status in results.values()
+        )
+        counts["skipped"] = len(emails) - counts["created"]
+
+        if options["send"] and not options["dry_run"]:
+            invitations = list(created.values())
+            invitations += self.get_unsent(
+                [
+                    email
+                    for email, status in results.items()
+                    if status == INVITATION_PENDING
+                ],
+            )
+            errors = Invitation.send_invitations(invitations, None)
+            failed = []
+            for invitation, error in zip(invitations, errors):
+                if error is not None:
+                    failed.append(invitation.pk)
+                    self.stderr.write(
+                        f"Sending to {invitation.email} failed: {error}",
+                    )
+            # Failed invitations are deleted so they can be imported again.
+            Invitation.objects.filter(pk__in=failed).delete()
+            counts["failed"] = len(failed)
+        return counts
+
+    def get_unsent(self, emails):
+        """
+        Returns the invitations of `emails` that were created but never sent
+        or queued, e.g. by an interrupted import.
+        """
+        if not emails:
+            return []
+        unsent = Invitation.objects.filter(
+            normalized_email__in=emails,
+            sent__isnull=True,
+            accepted=False,
+        )
+        if app_settings.USE_EMAIL_OUTBOX:
+            unsent = unsent.exclude(
+                pk__in=PendingInvitationEmail.objects.values("invitation"),
+            )
+        return list(unsent.select_related("inviter"))
@@ -0,0 +1,43 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from ...models import PendingInvitationEmail
+
+
+class Command(BaseCommand):
+    help = "Sends invitation e-mails queued in the outbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Number of e-mails locked and sent per transaction.",
+        )
+        parser.add_argument(
+            "--max-attempts",
+            type=int,
+            default=5,
+            help="Give up on an e-mail after this many failed attempts.",
+        )
+        parser.add_argument(
+            "--retry-delay",
+            type=float,
+            default=300,
+            help="Seconds before the first retry, doubled after each failure.",
+        )
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = PendingInvitationEmail.objects.send_pending(
+                batch_size=options["batch_size"],
+                max_attempts=options["max_attempts"],
+                retry_delay=timedelta(seconds=options["retry_delay"]),
+            )
+            total_sent += sent
+            total_failed += failed
+            if not sent and not failed:
+                break
+        self.stdout.write(f"Sent {total_sent} invitations, {total_failed} failed.")
@@ -1,10 +1,44 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 
-from django.db import models
-from django.db.models import Q
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, connections, models, transaction
+from django.db.models import Max, Min, Q
+from django.db.models.functions import Lower
 from django.utils import timezone
 
+from . import key_filter, metrics, state_cache, tracing
 from .app_settings import app_settings
+from .keys import generate_key
+from .utils import get_invitation_model, normalize_email
+
+INVITATION_CREATED = "created"
+INVITATION_PENDING = "already_invited"
+INVITATION_ACCEPTED = "accepted"
+INVITATION_REGISTERED = "registered"
+
+
+class _RowBudget:
+    """Thread-safe allowance of rows shared by purge workers."""
+
+    def __init__(self, max_rows):
+        self.remaining = max_rows
+        self.lock = threading.Lock()
+
+    def take(self, count):
+        with self.lock:
+            if self.remaining is None:
+                return count
+            count = min(count, self.remaining)
+            self.remaining -= count
+            return count
+
+    def give_back(self, count):
+        with self.lock:
+            if self.remaining is not None:
+                self.remaining += count
 
 
 class BaseInvitationManager(models.Manager):
@@ -12,12 +46,278 @@ class BaseInvitationManager(models.Manager):
         return self.filter(self.expired_q())
 
     def all_valid(self):
-        return self.exclude(self.expired_q())
+        return self.filter(self.valid_q())
+
+    def sent_threshold(self):
+        return timezone.now() - app_settings.INVITATION_EXPIRY_DELTA
 
     def expired_q(self):
-        sent_threshold = timezone.now() - timedelta(days=app_settings.INVITATION_EXPIRY)
-        q = Q(accepted=True) | Q(sent__lt=sent_threshold)
+        # Each branch matches one of the indexes declared on Invitation.
+        sent_threshold = self.sent_threshold()
+        q = Q(accepted=True) | Q(accepted=False, sent__lt=sent_threshold)
+        return q
+
+    def valid_q(self):
+        sent_threshold = self.sent_threshold()
+        q = Q(accepted=False) & (Q(sent__gte=sent_threshold) | Q(sent__isnull=True))
         return q
 
-    def delete_expired_confirmations(self):
-        self.all_expired().delete()
+    @tracing.traced("invitations.delete_expired_confirmations")
+    def delete_expired_confirmations(
+        self,
+        batch_size=1000,
+        sleep=0,
+        max_rows=None,
+        dry_run=False,
+        workers=1,
+    ):
+        """
+        Deletes expired and accepted invitations in primary key ordered
+        batches of `batch_size`, each in its own transaction, so writes to
+        the table are never blocked for long.
+
+        Django deletes each batch with a single raw DELETE unless signal
+        receivers or cascades need the objects. With `workers` above 1,
+        disjoint ranges of the (integer) primary key are purged by parallel
+        threads.
+
+        Returns the number of invitations deleted, or with `dry_run` the
+        number that would be deleted.
+        """
+        expired = self.all_expired()
+        if dry_run:
+            count = expired.count()
+            return count if max_rows is None else min(count, max_rows)
+
+        bounds = expired.aggregate(low=Min("pk"), high=Max("pk"))
+        if bounds["low"] is None:
+            return 0
+        budget = _RowBudget(max_rows)
+        if workers <= 1:
+            return self._delete_expired_range(
+                bounds["low"],
+                bounds["high"],
+                batch_size,
+                sleep,
+                budget,
+            )
+
+        step = (bounds["high"] - bounds["low"]) // workers + 1
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    self._delete_expired_range_in_thread,
+                    low,
+                    min(low + step - 1, bounds["high"]),
+                    batch_size,
+                    sleep,
+                    budget,
+                )
+                for low in range(bounds["low"], bounds["high"] + 1, step)
+            ]
+            return sum(future.result() for future in futures)
+
+    def _delete_expired_range(self, low, high, batch_size, sleep, budget):
+        expired = self.all_expired().filter(pk__lte=high).order_by("pk")
+        remaining = expired.filter(pk__gte=low)
+        deleted = 0
+        while True:
+            limit = budget.take(batch_size)
+            if not limit:
+                break
+            pks = list(remaining.values_list("pk", flat=True)[:limit])
+            budget.give_back(limit - len(pks))
+            if not pks:
+                break
+            # Rows resent since they were selected are no longer expired.
+            with transaction.atomic(using=self.db):
+                _, counts = expired.filter(pk__in=pks).delete()
+            count = counts.get(self.model._meta.label, 0)
+            metrics.increment("invitations_deleted_total", count)
+            deleted += count
+            remaining = expired.filter(pk__gt=pks[-1])
+            if sleep:
+                time.sleep(sleep)
+        return deleted
+
+    def _delete_expired_range_in_thread(self, *args):
+        try:
+            return self._delete_expired_range(*args)
+        finally:
+            connections[self.db].close()
+
+    @tracing.traced("invitations.bulk_create_invitations")
+    def bulk_create_invitations(
+        self,
+        emails,
+        inviter=None,
+        batch_size=500,
+        dry_run=False,
+        return_invitations=False,
+        **kwargs,
+    ):
+        """
+        Creates invitations for many addresses with a constant number of
+        queries per `batch_size` addresses.
+
+        Addresses are de-duplicated once normalized, the first spelling of
+        each is stored. Returns a dict mapping
+        each normalized address to ``INVITATION_CREATED``,
+        ``INVITATION_PENDING``, ``INVITATION_ACCEPTED`` or
+        ``INVITATION_REGISTERED``. With `dry_run`, nothing is created but
+        the same dict is returned.
+
+        Addresses inserted by a concurrent call in the meantime are skipped
+        and reported as ``INVITATION_PENDING``. With `return_invitations`,
+        a ``(results, invitations)`` tuple is returned instead, where
+        `invitations` maps the normalized addresses of the created
+        invitations to them.
+        """
+        spellings = {}
+        for email in emails:
+            spellings.setdefault(normalize_email(email), email.strip())
+        results = dict.fromkeys(spellings)
+        addresses = list(results)
+        users = get_user_model()._default_manager.annotate(email_lower=Lower("email"))
+        for start in range(0, len(addresses), batch_size):
+            end = start + batch_size
+            batch = addresses[start:end]
+            invited = self.filter(normalized_email__in=batch).values_list(
+                "normalized_email",
+                "accepted",
+            )
+            for email, accepted in invited:
+                results[email] = INVITATION_ACCEPTED if accepted else INVITATION_PENDING
+            registered = users.filter(email_lower__in=batch).values_list(
+                "email_lower",
+                flat=True,
+            )
+            for email in registered:
+                if results[email] is None:
+                    results[email] = INVITATION_REGISTERED
+
+        if dry_run:
+            results = {
+                email: INVITATION_CREATED if status is None else status
+                for email, status in results.items()
+            }
+            return (results, {}) if return_invitations else results
+
+        new_invitations = [
+            self.model(
+                email=spellings[email],
+                normalized_email=email,
+                key=generate_key(),
+                inviter=inviter,
+                **kwargs,
+            )
+            for email, status in results.items()
+            if status is None
+        ]
+        new_keys = [invitation.key for invitation in new_invitations]
+        key_filter.add_keys(*new_keys)
+        if self.model._meta.parents:
+            # Multi-table inherited models can't be bulk created.
+            with transaction.atomic(using=self.db):
+                for invitation in new_invitations:
+                    try:
+                        with transaction.atomic(using=self.db):
+                            invitation.save(using=self.db)
+                    except IntegrityError:
+                        pass
+        else:
+            self.bulk_create(
+                new_invitations,
+                batch_size=batch_size,
+                ignore_conflicts=True,
+            )
+        # Rows are read back by their new keys, as conflicting rows of
+        # concurrent calls were silently skipped.
+        created = {}
+        if new_keys:
+            created = self.select_related("inviter").in_bulk(
+                new_keys,
+                field_name="key",
+            )
+        state_cache.invalidate(*new_keys)
+        if created:
+            metrics.increment("invitations_created_total", len(created))
+        invitations = {}
+        for invitation in new_invitations:
+            if invitation.key in created:
+                invitations[invitation.normalized_email] = created[invitation.key]
+                results[invitation.normalized_email] = INVITATION_CREATED
+            else:
+                results[invitation.normalized_email] = INVITATION_PENDING
+        return (results, invitations) if return_invitations else results
+
+
+class PendingInvitationEmailManager(models.Manager):
+    @tracing.traced("invitations.send_pending")
+    def send_pending(
+        self,
+        batch_size=100,
+        max_attempts=5,
+        retry_delay=timedelta(minutes=5),
+    ):
+        """
+        Sends one batch of queued invitation e-mails over a single mail
+        connection.
+
+        The batch stays locked until it has been processed, and locked rows
+        are skipped where the backend supports it, so several workers can
+        drain the outbox at once. Failed e-mails are retried with an
+        exponential backoff until `max_attempts` is reached, then their
+        invitation is deleted if it was never sent, so the address can be
+        invited again.
+
+        Returns a ``(sent, failed)`` tuple of counts.
+        """
+        features = connections[self.db].features
+        with transaction.atomic(using=self.db):
+            entries = list(
+                self.select_for_update(
+                    skip_locked=features.has_select_for_update_skip_locked,
+                )
+                .filter(attempts__lt=max_attempts, next_attempt__lte=timezone.now())
+                .order_by("pk")[:batch_size],
+            )
+            if not entries:
+                return 0, 0
+            Invitation = get_invitation_model()
+            invitations = Invitation._default_manager.in_bulk(
+                [entry.invitation_id for entry in entries],
+            )
+            errors = Invitation.deliver_invitations(
+                [invitations[entry.invitation_id] for entry in entries],
+                [
+                    entry.get_invite_context(invitations[entry.invitation_id])
+                    for entry in entries
+                ],
+            )
+            delivered = []
+            dead = []
+            for entry, error in zip(entries, errors):
+                if error is None:
+                    delivered.append(entry.pk)
+                    continue
+                entry.attempts += 1
+                entry.last_error = str(error)
+                entry.next_attempt = timezone.now() + retry_delay * 2 ** (
+                    entry.attempts - 1
+                )
+                entry.save(update_fields=["attempts", "last_error", "next_attempt"])
+                if entry.attempts >= max_attempts:
+                    dead.append(entry.invitation_id)
+            self.filter(pk__in=delivered).delete()
+            if dead:
+                # Never sent invitations would stay pending forever, as
+                # only sent ones expire. Their entries are deleted with them.
+                Invitation._default_manager.filter(
+                    pk__in=dead,
+                    sent__isnull=True,
+                    accepted=False,
+                ).delete()
+            sent = len(delivered)
+            failed = len(entries) - sent
+        return sent, failed
@@ -0,0 +1,139 @@
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .app_settings import app_settings
+from .utils import import_attribute
+
+
+class BaseMetricsCollector:
+    """
+    Receives the metrics of the invitation code paths. Subclass it to
+    forward them to a metrics library.
+    """
+
+    def increment(self, name, value=1, **labels):
+        pass
+
+    def observe(self, name, seconds, **labels):
+        pass
+
+    def render(self):
+        """
+        Returns the metrics in the Prometheus text exposition format.
+        """
+        return ""
+
+
+class InMemoryCollector(BaseMetricsCollector):
+    """
+    Keeps counters and latency histograms in this process.
+    """
+
+    buckets = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10)
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # {name: {labels: value}}
+        self._counters = {}
+        # {name: {labels: [bucket counts..., sum, count]}}
+        self._histograms = {}
+
+    def increment(self, name, value=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            values = self._counters.setdefault(name, {})
+            values[key] = values.get(key, 0) + value
+
+    def observe(self, name, seconds, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            values = self._histograms.setdefault(name, {})
+            histogram = values.setdefault(key, [0] * (len(self.buckets) + 2))
+            bucket = bisect.bisect_left(self.buckets, seconds)
+            if bucket < len(self.buckets):
+                histogram[bucket] += 1
+            histogram[-2] += seconds
+            histogram[-1] += 1
+
+    def render(self):
+        lines = []
+        with self._lock:
+            for name, values in sorted(self._counters.items()):
+                lines.append(f"# TYPE {name} counter")
+                for labels, value in sorted(values.items()):
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+            for name, values in sorted(self._histograms.items()):
+                lines.append(f"# TYPE {name} histogram")
+                for labels, histogram in sorted(values.items()):
+                    lines.extend(self._render_histogram(name, labels, histogram))
+        return "".join(f"{line}\n" for line in lines)
+
+    def _render_histogram(self, name, labels, histogram):
+        cumulative = 0
+        for le, count in zip(self.buckets, histogram):
+            cumulative += count
+            le_labels = _format_labels((*labels, ("le", str(le))))
+            yield f"{name}_bucket{le_labels} {cumulative}"
+        le_labels = _format_labels((*labels, ("le", "+Inf")))
+        yield f"{name}_bucket{le_labels} {histogram[-1]}"
+        yield f"{name}_sum{_format_labels(labels)} {histogram[-2]}"
+        yield f"{name}_count{_format_labels(labels)} {histogram[-1]}"
+
+
+def _escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{_escape_label(value)}"' for name, value in labels)
+    return f"{{{pairs}}}"
+
+
+def get_collector():
+    """
+    Returns the collector configured with ``INVITATIONS_METRICS_COLLECTOR``,
+    or ``None`` when metrics are disabled.
+    """
+    if app_settings.METRICS_COLLECTOR is None:
+        return None
+    return _get_collector(app_settings.METRICS_COLLECTOR)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_collector(path):
+    return import_attribute(path)()
+
+
+@receiver(setting_changed)
+def clear_collector_cache(**kwargs):
+    _get_collector.cache_clear()
+
+
+def increment(name, value=1, **labels):
+    collector = get_collector()
+    if collector is not None:
+        collector.increment(name, value, **labels)
+
+
+@contextmanager
+def timer(name, **labels):
+    """
+    Observes the time spent in the block as `name`.
+    """
+    collector = get_collector()
+    if collector is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        collector.observe(name, time.perf_counter() - start, **labels)
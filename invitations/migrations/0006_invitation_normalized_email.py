@@ -0,0 +1,75 @@
+from django.conf import settings
+from django.db import migrations, models
+
+from invitations.utils import normalize_email
+
+EMAIL_MAX_LENGTH = getattr(settings, "INVITATIONS_EMAIL_MAX_LENGTH", 254)
+BATCH_SIZE = 1000
+
+
+def populate_normalized_email(apps, schema_editor):
+    Invitation = apps.get_model("invitations", "Invitation")
+    invitations = Invitation.objects.using(schema_editor.connection.alias)
+    # Normalized in Python like new invitations, as SQL functions don't fold
+    # the case of non-ASCII characters or strip all whitespace everywhere.
+    # normalized_email is made unique below, so addresses that collide once
+    # normalized must be resolved by hand first.
+    ordered = invitations.order_by("pk")
+    emails = {}
+    for email in ordered.values_list("email", flat=True).iterator(BATCH_SIZE):
+        emails.setdefault(normalize_email(email), []).append(email)
+    collisions = sorted(
+        ", ".join(spellings) for spellings in emails.values() if len(spellings) > 1
+    )
+    if collisions:
+        raise RuntimeError(
+            "Several invitations have the same e-mail address ignoring case. "
+            "Delete all but one invitation of each of these addresses, then "
+            "run the migration again:\n" + "\n".join(collisions),
+        )
+
+    # Updated in primary key ranges rather than while reading a cursor.
+    last_pk = None
+    while True:
+        batch = ordered.only("pk", "email")
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        batch = list(batch[:BATCH_SIZE])
+        if not batch:
+            break
+        for invitation in batch:
+            invitation.normalized_email = normalize_email(invitation.email)
+        invitations.bulk_update(batch, ["normalized_email"])
+        last_pk = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("invitations", "0005_alter_invitation_inviter"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="invitation",
+            name="normalized_email",
+            field=models.EmailField(
+                default="",
+                editable=False,
+                max_length=EMAIL_MAX_LENGTH,
+                verbose_name="normalized e-mail address",
+            ),
+            preserve_default=False,
+        ),
+        migrations.RunPython(populate_normalized_email, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="invitation",
+            name="normalized_email",
+            field=models.EmailField(
+                editable=False,
+                max_length=EMAIL_MAX_LENGTH,
+                unique=True,
+                verbose_name="normalized e-mail address",
+            ),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.14 on 2026-10-18 13:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("invitations", "0006_invitation_normalized_email"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="invitation",
+            index=models.Index(
+                fields=["accepted", "sent"], name="invitations_accepted_sent_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="invitation",
+            index=models.Index(
+                condition=models.Q(accepted=False),
+                fields=["sent"],
+                name="invitations_pending_sent_idx",
+            ),
+        ),
+    ]
@@ -1,5 +1,4 @@
-import datetime
-
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from django.contrib.sites.shortcuts import get_current_site
 
@@ -9,14 +8,17 @@ except ImportError:
     from django.urls import reverse
 
 from django.db import models
+from django.db.models import Q
 from django.utils import timezone
-from django.utils.crypto import get_random_string
 from django.utils.translation import gettext_lazy as _
 
-from . import signals
+from . import key_filter, metrics, signals, state_cache, tracing
 from .adapters import get_invitations_adapter
 from .app_settings import app_settings
 from .base_invitation import AbstractBaseInvitation
+from .keys import generate_key, signed_key_expired
+from .managers import PendingInvitationEmailManager
+from .utils import normalize_email
 
 
 class Invitation(AbstractBaseInvitation):
@@ -25,54 +27,338 @@ class Invitation(AbstractBaseInvitation):
         verbose_name=_("e-mail address"),
         max_length=app_settings.EMAIL_MAX_LENGTH,
     )
+    normalized_email = models.EmailField(
+        unique=True,
+        editable=False,
+        verbose_name=_("normalized e-mail address"),
+        max_length=app_settings.EMAIL_MAX_LENGTH,
+    )
     created = models.DateTimeField(verbose_name=_("created"), default=timezone.now)
 
+    email_template = "invitations/email/email_invite"
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["accepted", "sent"],
+                name="invitations_accepted_sent_idx",
+            ),
+            # Only used on backends supporting partial indexes.
+            models.Index(
+                fields=["sent"],
+                condition=Q(accepted=False),
+                name="invitations_pending_sent_idx",
+            ),
+        ]
+
     @classmethod
     def create(cls, email, inviter=None, **kwargs):
-        key = get_random_string(64).lower()
+        key = generate_key()
         instance = cls._default_manager.create(
             email=email, key=key, inviter=inviter, **kwargs
         )
+        metrics.increment("invitations_created_total")
         return instance
 
-    def key_expired(self):
-        expiration_date = self.sent + datetime.timedelta(
-            days=app_settings.INVITATION_EXPIRY,
+    @classmethod
+    async def acreate(cls, email, inviter=None, **kwargs):
+        key = generate_key()
+        instance = await cls._default_manager.acreate(
+            email=email, key=key, inviter=inviter, **kwargs
         )
-        return expiration_date <= timezone.now()
+        metrics.increment("invitations_created_total")
+        return instance
 
-    def send_invitation(self, request, **kwargs):
+    @classmethod
+    def bulk_create_invitations(cls, emails, inviter=None, batch_size=500, **kwargs):
+        """
+        Creates invitations for all new addresses in `emails`, see
+        `BaseInvitationManager.bulk_create_invitations`.
+        """
+        return cls._default_manager.bulk_create_invitations(
+            emails,
+            inviter=inviter,
+            batch_size=batch_size,
+            **kwargs,
+        )
+
+    def save(self, *args, **kwargs):
+        self.normalized_email = normalize_email(self.email)
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None and "email" in update_fields:
+            kwargs["update_fields"] = {*update_fields, "normalized_email"}
+        key_filter.add_keys(self.key)
+        super().save(*args, **kwargs)
+        state_cache.invalidate(self.key)
+
+    def delete(self, *args, **kwargs):
+        state_cache.invalidate(self.key)
+        return super().delete(*args, **kwargs)
+
+    def key_expired(self):
+        # Queued e-mails can be delivered before their invitation is marked
+        # as sent, and unsent invitations don't expire, like in valid_q().
+        if self.sent is None:
+            return signed_key_expired(self.key)
+        expiration_date = self.sent + app_settings.INVITATION_EXPIRY_DELTA
+        return expiration_date <= timezone.now() or signed_key_expired(self.key)
+
+    def get_invite_context(self, request, **kwargs):
         current_site = get_current_site(request)
         invite_url = reverse(app_settings.CONFIRMATION_URL_NAME, args=[self.key])
-        invite_url = request.build_absolute_uri(invite_url)
+        if request is None:
+            # Sent outside of a request, e.g. by a management command.
+            protocol = app_settings.DEFAULT_HTTP_PROTOCOL
+            invite_url = f"{protocol}://{current_site.domain}{invite_url}"
+        else:
+            invite_url = request.build_absolute_uri(invite_url)
         ctx = kwargs
         ctx.update(
             {
                 "invite_url": invite_url,
                 "site_name": current_site.name,
-                "email": self.email,
-                "key": self.key,
-                "inviter": self.inviter,
             },
         )
+        return ctx
+
+    def get_email_context(self, ctx):
+        return {
+            **ctx,
+            "email": self.email,
+            "key": self.key,
+            "inviter": self.inviter,
+        }
+
+    @tracing.traced("invitations.send_invitation")
+    def send_invitation(self, request, **kwargs):
+        ctx = self.get_invite_context(request, **kwargs)
+
+        if app_settings.USE_EMAIL_OUTBOX:
+            PendingInvitationEmail.objects.create(
+                invitation=self,
+                context=PendingInvitationEmail.get_queued_context(self, ctx),
+            )
+        else:
+            self.deliver_invitation(ctx)
+
+    @classmethod
+    @tracing.traced("invitations.send_invitations")
+    def send_invitations(cls, invitations, request, **kwargs):
+        """
+        Sends many invitations over a single mail connection, or queues them
+        with ``INVITATIONS_USE_EMAIL_OUTBOX``.
 
-        email_template = "invitations/email/email_invite"
+        Returns a list holding, for every invitation, ``None`` if it was sent
+        or queued or the exception that prevented it.
+        """
+        contexts = [
+            invitation.get_invite_context(request, **kwargs)
+            for invitation in invitations
+        ]
 
-        get_invitations_adapter().send_mail(email_template, self.email, ctx)
+        if app_settings.USE_EMAIL_OUTBOX:
+            PendingInvitationEmail.objects.bulk_create(
+                [
+                    PendingInvitationEmail(
+                        invitation=invitation,
+                        context=PendingInvitationEmail.get_queued_context(
+                            invitation,
+                            ctx,
+                        ),
+                    )
+                    for invitation, ctx in zip(invitations, contexts)
+                ],
+            )
+            return [None] * len(invitations)
+        return cls.deliver_invitations(invitations, contexts)
+
+    @classmethod
+    @tracing.traced("invitations.send_invitations")
+    async def asend_invitations(cls, invitations, request, **kwargs):
+        """
+        Async variant of `send_invitations`.
+        """
+        # The current site may have to be fetched.
+        contexts = await sync_to_async(
+            lambda: [
+                invitation.get_invite_context(request, **kwargs)
+                for invitation in invitations
+            ],
+        )()
+
+        if app_settings.USE_EMAIL_OUTBOX:
+            await PendingInvitationEmail.objects.abulk_create(
+                [
+                    PendingInvitationEmail(
+                        invitation=invitation,
+                        context=PendingInvitationEmail.get_queued_context(
+                            invitation,
+                            ctx,
+                        ),
+                    )
+                    for invitation, ctx in zip(invitations, contexts)
+                ],
+            )
+            return [None] * len(invitations)
+        return await cls.adeliver_invitations(invitations, contexts)
+
+    def deliver_invitation(self, ctx):
+        """
+        Sends the invitation e-mail and marks the invitation as sent. `ctx`
+        must hold at least the "invite_url" and "site_name" of the invite.
+        """
+        ctx = self.get_email_context(ctx)
+
+        try:
+            get_invitations_adapter().send_mail(self.email_template, self.email, ctx)
+        except Exception:
+            metrics.increment("invitations_send_failed_total")
+            raise
+        metrics.increment("invitations_sent_total")
         self.sent = timezone.now()
-        self.save()
+        self.save(update_fields=["sent"])
+
+        with tracing.span("invitations.invite_url_sent"):
+            signals.invite_url_sent.send(
+                sender=self.__class__,
+                instance=self,
+                invite_url_sent=ctx["invite_url"],
+                inviter=self.inviter,
+            )
 
-        signals.invite_url_sent.send(
-            sender=self.__class__,
-            instance=self,
-            invite_url_sent=invite_url,
-            inviter=self.inviter,
+    @classmethod
+    @tracing.traced("invitations.deliver_invitations")
+    def deliver_invitations(cls, invitations, contexts):
+        """
+        Sends the e-mails of many invitations over a single mail connection
+        and marks the delivered ones as sent with one UPDATE, see
+        `deliver_invitation`.
+        """
+        errors = get_invitations_adapter().send_mails(
+            cls._get_mails(invitations, contexts),
         )
 
+        delivered = [
+            (invitation, ctx)
+            for invitation, ctx, error in zip(invitations, contexts, errors)
+            if error is None
+        ]
+        cls._count_deliveries(len(delivered), len(errors) - len(delivered))
+        now = timezone.now()
+        cls._default_manager.filter(
+            pk__in=[invitation.pk for invitation, ctx in delivered],
+        ).update(sent=now)
+        state_cache.invalidate(*[invitation.key for invitation, ctx in delivered])
+        with tracing.span("invitations.invite_url_sent", count=len(delivered)):
+            for invitation, ctx in delivered:
+                invitation.sent = now
+                signals.invite_url_sent.send(
+                    sender=invitation.__class__,
+                    instance=invitation,
+                    invite_url_sent=ctx["invite_url"],
+                    inviter=invitation.inviter,
+                )
+        return errors
+
+    @classmethod
+    @tracing.traced("invitations.deliver_invitations")
+    async def adeliver_invitations(cls, invitations, contexts):
+        """
+        Async variant of `deliver_invitations`.
+        """
+        # The inviters may have to be fetched.
+        mails = await sync_to_async(cls._get_mails)(invitations, contexts)
+        errors = await get_invitations_adapter().asend_mails(mails)
+
+        delivered = [
+            (invitation, ctx)
+            for invitation, ctx, error in zip(invitations, contexts, errors)
+            if error is None
+        ]
+        cls._count_deliveries(len(delivered), len(errors) - len(delivered))
+        now = timezone.now()
+        await cls._default_manager.filter(
+            pk__in=[invitation.pk for invitation, ctx in delivered],
+        ).aupdate(sent=now)
+        state_cache.invalidate(*[invitation.key for invitation, ctx in delivered])
+        with tracing.span("invitations.invite_url_sent", count=len(delivered)):
+            for invitation, ctx in delivered:
+                invitation.sent = now
+                await signals.invite_url_sent.asend(
+                    sender=invitation.__class__,
+                    instance=invitation,
+                    invite_url_sent=ctx["invite_url"],
+                    inviter=invitation.inviter,
+                )
+        return errors
+
+    @staticmethod
+    def _count_deliveries(sent, failed):
+        if sent:
+            metrics.increment("invitations_sent_total", sent)
+        if failed:
+            metrics.increment("invitations_send_failed_total", failed)
+
+    @staticmethod
+    def _get_mails(invitations, contexts):
+        return [
+            (
+                invitation.email_template,
+                invitation.email,
+                invitation.get_email_context(ctx),
+            )
+            for invitation, ctx in zip(invitations, contexts)
+        ]
+
     def __str__(self):
         return f"Invite: {self.email}"
 
 
+class PendingInvitationEmail(models.Model):
+    """
+    Outbox entry for an invitation e-mail queued with
+    ``INVITATIONS_USE_EMAIL_OUTBOX``, sent by ``send_pending_invitations``.
+    """
+
+    invitation = models.ForeignKey(
+        Invitation,
+        verbose_name=_("invitation"),
+        on_delete=models.CASCADE,
+        related_name="pending_emails",
+    )
+    context = models.JSONField(verbose_name=_("context"), default=dict)
+    created = models.DateTimeField(verbose_name=_("created"), default=timezone.now)
+    next_attempt = models.DateTimeField(
+        verbose_name=_("next attempt"),
+        default=timezone.now,
+        db_index=True,
+    )
+    attempts = models.PositiveIntegerField(verbose_name=_("attempts"), default=0)
+    last_error = models.TextField(verbose_name=_("last error"), blank=True)
+
+    objects = PendingInvitationEmailManager()
+
+    def __str__(self):
+        return f"Pending e-mail: {self.invitation.email}"
+
+    @staticmethod
+    def get_queued_context(invitation, ctx):
+        # The key the invite URL was built for is kept, in case the key is
+        # reissued before the e-mail is sent.
+        return {**ctx, "key": invitation.key}
+
+    def get_invite_context(self, invitation):
+        """
+        Returns the queued invite context, with the invite URL of the
+        current key of `invitation`.
+        """
+        ctx = dict(self.context)
+        key = ctx.pop("key", None)
+        if key is not None and key != invitation.key:
+            ctx["invite_url"] = ctx["invite_url"].replace(key, invitation.key)
+        return ctx
+
+
 # here for backwards compatibility, historic allauth adapter
 if hasattr(settings, "ACCOUNT_ADAPTER"):
     if settings.ACCOUNT_ADAPTER == "invitations.models.InvitationsAdapter":
@@ -0,0 +1,82 @@
+import math
+import time
+
+from django.core.cache import caches
+
+from . import metrics
+from .app_settings import app_settings
+from .exceptions import RateLimited, TooManyInvitations
+
+
+def _get_limits(inviter):
+    limits = []
+    if app_settings.INVITER_RATE and inviter is not None and inviter.pk is not None:
+        limits.append(
+            (
+                f"invitations:rate-limit:{inviter.pk}",
+                app_settings.INVITER_RATE,
+                app_settings.INVITER_BURST,
+            ),
+        )
+    if app_settings.GLOBAL_RATE:
+        limits.append(
+            (
+                "invitations:rate-limit",
+                app_settings.GLOBAL_RATE,
+                app_settings.GLOBAL_BURST,
+            ),
+        )
+    return limits
+
+
+def get_max_count(inviter):
+    """
+    Returns the largest number of invitations `inviter` can ever send at
+    once, or ``None`` if it isn't limited.
+    """
+    limits = _get_limits(inviter)
+    if not limits:
+        return None
+    return min(burst for key, rate, burst in limits)
+
+
+def take(inviter, count=1):
+    """
+    Takes `count` invitations from the token buckets of `inviter` and of the
+    site, kept in ``INVITATIONS_RATE_LIMIT_CACHE``. Raises `RateLimited`
+    without taking anything if either is short, or `TooManyInvitations` if
+    `count` is larger than either can ever hold.
+
+    Concurrent requests may both read a bucket before either updates it,
+    so the limit is approximate.
+    """
+    limits = _get_limits(inviter)
+    if not limits:
+        return
+    max_count = min(burst for key, rate, burst in limits)
+    if count > max_count:
+        raise TooManyInvitations(max_count)
+    cache = caches[app_settings.RATE_LIMIT_CACHE]
+    now = time.time()
+    buckets = cache.get_many([key for key, rate, burst in limits])
+
+    available = {}
+    retry_after = 0
+    for key, rate, burst in limits:
+        tokens, updated = buckets.get(key, (burst, now))
+        available[key] = min(burst, tokens + (now - updated) * rate)
+        if available[key] < count:
+            retry_after = max(retry_after, (count - available[key]) / rate)
+    if retry_after:
+        metrics.increment(
+            "invitations_rejected_total",
+            count,
+            stage="invite",
+            reason="rate_limited",
+        )
+        raise RateLimited(retry_after)
+
+    for key, rate, burst in limits:
+        tokens = available[key] - count
+        # Expire the bucket once it is full again.
+        cache.set(key, (tokens, now), math.ceil((burst - tokens) / rate) + 1)
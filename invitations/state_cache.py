@@ -0,0 +1,51 @@
+from django.core.cache import caches
+
+from .app_settings import app_settings
+
+# Cached state of keys that don't belong to any invitation.
+UNKNOWN = "unknown"
+
+
+def _cache_key(key):
+    return f"invitations:state:{key}"
+
+
+def get_state(key):
+    """
+    Returns the cached state of the invitation with `key` as a dict of its
+    `accepted`, `email` and `sent` values, ``UNKNOWN`` if no invitation has
+    that key, or ``None`` if nothing is cached.
+    """
+    if app_settings.STATE_CACHE is None:
+        return None
+    return caches[app_settings.STATE_CACHE].get(_cache_key(key))
+
+
+def set_state(invitation):
+    if app_settings.STATE_CACHE is None:
+        return
+    caches[app_settings.STATE_CACHE].set(
+        _cache_key(invitation.key),
+        {
+            "accepted": invitation.accepted,
+            "email": invitation.email,
+            "sent": invitation.sent,
+        },
+        app_settings.STATE_CACHE_TIMEOUT,
+    )
+
+
+def set_unknown(key):
+    if app_settings.STATE_CACHE is None:
+        return
+    caches[app_settings.STATE_CACHE].set(
+        _cache_key(key),
+        UNKNOWN,
+        app_settings.STATE_CACHE_UNKNOWN_TIMEOUT,
+    )
+
+
+def invalidate(*keys):
+    if app_settings.STATE_CACHE is None or not keys:
+        return
+    caches[app_settings.STATE_CACHE].delete_many([_cache_key(key) for key in keys])
@@ -0,0 +1,117 @@
+import contextvars
+import functools
+import inspect
+import json
+import logging
+import secrets
+import time
+from contextlib import contextmanager, nullcontext
+
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .app_settings import app_settings
+from .utils import import_attribute
+
+# Span of the code running in the current thread or task.
+_current_span = contextvars.ContextVar("invitations_span", default=None)
+
+_no_span = nullcontext()
+
+
+class BaseTracer:
+    """
+    Traces the invitation code paths. `span` returns a context manager
+    wrapping the traced block, spans opened inside it are its children.
+    This base class doesn't record anything.
+    """
+
+    def span(self, name, **attributes):
+        return _no_span
+
+
+class LoggingTracer(BaseTracer):
+    """
+    Logs every finished span as a JSON object to the
+    ``invitations.tracing`` logger, at the INFO level.
+    """
+
+    logger = logging.getLogger("invitations.tracing")
+
+    @contextmanager
+    def span(self, name, **attributes):
+        parent = _current_span.get()
+        span = {
+            "name": name,
+            "trace_id": parent["trace_id"] if parent else secrets.token_hex(16),
+            "span_id": secrets.token_hex(8),
+            "parent_id": parent["span_id"] if parent else None,
+            "start": time.time(),
+            "attributes": attributes,
+        }
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException as exc:
+            span["error"] = repr(exc)
+            raise
+        finally:
+            span["duration"] = time.perf_counter() - started
+            _current_span.reset(token)
+            self.logger.info(json.dumps(span, default=str))
+
+
+def get_tracer():
+    """
+    Returns the tracer configured with ``INVITATIONS_TRACER``, or ``None``
+    when tracing is disabled.
+    """
+    if app_settings.TRACER is None:
+        return None
+    return _get_tracer(app_settings.TRACER)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_tracer(path):
+    return import_attribute(path)()
+
+
+@receiver(setting_changed)
+def clear_tracer_cache(**kwargs):
+    _get_tracer.cache_clear()
+
+
+def span(name, **attributes):
+    """
+    Returns a context manager tracing the block it wraps as `name`.
+    """
+    tracer = get_tracer()
+    if tracer is None:
+        return _no_span
+    return tracer.span(name, **attributes)
+
+
+def traced(name):
+    """
+    Decorator tracing every call of the decorated function as `name`.
+    """
+
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+
+        else:
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with span(name):
+                    return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
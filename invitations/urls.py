@@ -1,18 +1,28 @@
 from django.urls import path, re_path
 
 from . import views
+from .app_settings import app_settings
+
+if app_settings.ASYNC_VIEWS:
+    SendInvite = views.AsyncSendInvite
+    SendJSONInvite = views.AsyncSendJSONInvite
+    AcceptInvite = views.AsyncAcceptInvite
+else:
+    SendInvite = views.SendInvite
+    SendJSONInvite = views.SendJSONInvite
+    AcceptInvite = views.AcceptInvite
 
 app_name = "invitations"
 urlpatterns = [
-    path("send-invite/", views.SendInvite.as_view(), name="send-invite"),
+    path("send-invite/", SendInvite.as_view(), name="send-invite"),
     path(
         "send-json-invite/",
-        views.SendJSONInvite.as_view(),
+        SendJSONInvite.as_view(),
         name="send-json-invite",
     ),
     re_path(
-        r"^accept-invite/(?P<key>\w+)/?$",
-        views.AcceptInvite.as_view(),
+        r"^accept-invite/(?P<key>[\w.-]+)/?$",
+        AcceptInvite.as_view(),
         name="accept-invite",
     ),
 ]
@@ -1,5 +1,9 @@
+import functools
+
 from django.apps import apps as django_apps
 from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
 
 from .app_settings import app_settings
 
@@ -9,6 +13,7 @@ except ImportError:
     from django.utils import importlib
 
 
+@functools.lru_cache(maxsize=None)
 def import_attribute(path):
     assert isinstance(path, str)
     pkg, attr = path.rsplit(".", 1)
@@ -16,6 +21,21 @@ def import_attribute(path):
     return ret
 
 
+def get_json_codec():
+    """
+    Returns the module named by ``INVITATIONS_JSON_CODEC``, which provides
+    the ``loads`` and ``dumps`` functions of the JSON invite endpoint.
+    """
+    return importlib.import_module(app_settings.JSON_CODEC)
+
+
+def normalize_email(email):
+    """
+    Returns the case-insensitive form of `email` used to match invitations.
+    """
+    return email.strip().lower()
+
+
 def get_invite_form():
     """
     Returns the form for sending an invite.
@@ -41,7 +61,11 @@ def get_invitation_model():
     """
     Returns the Invitation model that is active in this project.
     """
-    path = app_settings.INVITATION_MODEL
+    return _get_model(app_settings.INVITATION_MODEL)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_model(path):
     try:
         return django_apps.get_model(path)
     except ValueError:
@@ -50,5 +74,11 @@ def get_invitation_model():
         raise ImproperlyConfigured(
             "path refers to model '%s' that\
              has not been installed"
-            % app_settings.INVITATION_MODEL,
+            % path,
         )
+
+
+@receiver(setting_changed)
+def clear_import_cache(**kwargs):
+    import_attribute.cache_clear()
+    _get_model.cache_clear()
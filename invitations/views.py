@@ -1,38 +1,72 @@
-import json
+import inspect
+import math
+from itertools import islice
 
+from asgiref.sync import sync_to_async
 from django.contrib import messages
 from django.contrib.auth import REDIRECT_FIELD_NAME, logout
 from django.contrib.auth.decorators import login_required
-from django.core.exceptions import ValidationError
+from django.contrib.auth.views import redirect_to_login
+from django.core import signing
+from django.core.exceptions import RequestDataTooBig, ValidationError
 from django.core.validators import validate_email
+from django.db import IntegrityError, transaction
 from django.http import (
     Http404,
     HttpResponse,
     HttpResponseNotAllowed,
     HttpResponseRedirect,
+    StreamingHttpResponse,
 )
-from django.urls import reverse
-from django.urls.exceptions import NoReverseMatch
 from django.utils.decorators import method_decorator
 from django.utils.translation import gettext_lazy as _
 from django.views.generic import FormView, View
 from django.views.generic.detail import SingleObjectMixin
 
+from . import key_filter, metrics, rate_limit, state_cache, tracing
 from .adapters import get_invitations_adapter
 from .app_settings import app_settings
-from .exceptions import AlreadyAccepted, AlreadyInvited, UserRegisteredEmail
+from .exceptions import (
+    AlreadyAccepted,
+    AlreadyInvited,
+    RateLimited,
+    TooManyInvitations,
+    UserRegisteredEmail,
+)
 from .forms import CleanEmailMixin
+from .keys import check_signed_key, is_signed_key
 from .signals import invite_accepted
-from .utils import get_invitation_model, get_invite_form
+from .utils import (
+    get_invitation_model,
+    get_invite_form,
+    get_json_codec,
+    normalize_email,
+)
+
+try:
+    from django.contrib.auth import alogout
+except ImportError:  # Django < 5.0
+    alogout = sync_to_async(logout)
 
 Invitation = get_invitation_model()
 InviteForm = get_invite_form()
 
+NDJSON_CONTENT_TYPE = "application/x-ndjson"
+
+
+def _accepts_inviter(save):
+    parameters = inspect.signature(save).parameters.values()
+    return any(
+        parameter.name == "inviter" or parameter.kind == parameter.VAR_KEYWORD
+        for parameter in parameters
+    )
+
 
 class SendInvite(FormView):
     template_name = "invitations/forms/_invite.html"
     form_class = InviteForm
 
+    @tracing.traced("invitations.send_invite")
     @method_decorator(login_required)
     def dispatch(self, request, *args, **kwargs):
         return super().dispatch(request, *args, **kwargs)
@@ -41,11 +75,16 @@ class SendInvite(FormView):
         email = form.cleaned_data["email"]
 
         try:
-            invite = form.save(email)
-            invite.inviter = self.request.user
-            invite.save()
-            invite.send_invitation(self.request)
-        except Exception:
+            rate_limit.take(self.request.user)
+        except RateLimited as exc:
+            return self.rate_limited(form, exc)
+        try:
+            with transaction.atomic():
+                invite = self._save_invite(form, email, self.request.user)
+                invite.send_invitation(self.request)
+        except (IntegrityError, OSError):
+            # Invited by a concurrent request since the form was validated,
+            # or the e-mail couldn't be sent: SMTP errors are OSErrors.
             return self.form_invalid(form)
         return self.render_to_response(
             self.get_context_data(
@@ -53,13 +92,90 @@ class SendInvite(FormView):
             ),
         )
 
+    def _save_invite(self, form, email, inviter):
+        if _accepts_inviter(form.save):
+            return form.save(email, inviter=inviter)
+        # Custom forms may still define save(self, email).
+        invite = form.save(email)
+        invite.inviter = inviter
+        invite.save(update_fields=["inviter"])
+        return invite
+
     def form_invalid(self, form):
         return self.render_to_response(self.get_context_data(form=form))
 
+    def rate_limited(self, form, exc):
+        form.add_error(
+            "email",
+            _("Too many invitations, try again in %(seconds)d seconds.")
+            % {"seconds": math.ceil(exc.retry_after)},
+        )
+        return self.form_invalid(form)
+
+
+class AsyncSendInvite(SendInvite):
+    """
+    Async variant of `SendInvite`, see ``INVITATIONS_ASYNC_VIEWS``.
+    """
+
+    @tracing.traced("invitations.send_invite")
+    async def dispatch(self, request, *args, **kwargs):
+        self.user = await request.auser()
+        if not self.user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await super(SendInvite, self).dispatch(request, *args, **kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        return self.render_to_response(self.get_context_data())
+
+    async def post(self, request, *args, **kwargs):
+        form = self.get_form()
+        # Form validation is synchronous.
+        if await sync_to_async(form.is_valid)():
+            return await self.aform_valid(form)
+        return self.form_invalid(form)
+
+    async def put(self, *args, **kwargs):
+        return await self.post(*args, **kwargs)
+
+    async def aform_valid(self, form):
+        email = form.cleaned_data["email"]
+
+        try:
+            rate_limit.take(self.user)
+        except RateLimited as exc:
+            return self.rate_limited(form, exc)
+        try:
+            invite = await sync_to_async(self._create_invite)(form, email)
+        except IntegrityError:
+            return self.form_invalid(form)
+        if not app_settings.USE_EMAIL_OUTBOX:
+            errors = await Invitation.asend_invitations([invite], self.request)
+            if errors[0] is not None:
+                await invite.adelete()
+                return self.form_invalid(form)
+        return self.render_to_response(
+            self.get_context_data(
+                success_message=_("%(email)s has been invited") % {"email": email},
+            ),
+        )
+
+    def _create_invite(self, form, email):
+        # With the outbox, the e-mail is queued in the transaction creating
+        # the invitation.
+        with transaction.atomic():
+            invite = self._save_invite(form, email, self.user)
+            if app_settings.USE_EMAIL_OUTBOX:
+                invite.send_invitation(self.request)
+        return invite
+
 
 class SendJSONInvite(View):
     http_method_names = ["post"]
+    # Number of addresses of an NDJSON body handled per transaction.
+    stream_batch_size = 500
 
+    @tracing.traced("invitations.send_json_invite")
     @method_decorator(login_required)
     def dispatch(self, request, *args, **kwargs):
         if app_settings.ALLOW_JSON_INVITES:
@@ -68,62 +184,326 @@ class SendJSONInvite(View):
             raise Http404
 
     def post(self, request, *args, **kwargs):
-        status_code = 400
-        invitees = json.loads(request.body.decode())
+        if self._payload_too_large(request):
+            return HttpResponse(status=413)
+        if request.content_type == NDJSON_CONTENT_TYPE:
+            return StreamingHttpResponse(
+                self._stream_results(request),
+                content_type=NDJSON_CONTENT_TYPE,
+            )
+
+        invitees = get_json_codec().loads(request.body)
         response = {"valid": [], "invalid": []}
         if isinstance(invitees, list):
-            for invitee in invitees:
-                try:
-                    validate_email(invitee)
-                    CleanEmailMixin().validate_invitation(invitee)
-                    invite = Invitation.create(invitee)
-                except (ValueError, KeyError):
-                    pass
-                except ValidationError:
-                    response["invalid"].append({invitee: "invalid email"})
-                except AlreadyAccepted:
-                    response["invalid"].append({invitee: "already accepted"})
-                except AlreadyInvited:
+            try:
+                self._send_invites(invitees, response)
+            except RateLimited as exc:
+                return self._rate_limited_response(exc)
+            except TooManyInvitations as exc:
+                return self._too_many_invitations_response(exc)
+        return self._json_response(response)
+
+    def _send_invites(self, invitees, response):
+        checked = self._check_invitees(invitees)
+        statuses = CleanEmailMixin().validate_invitations(
+            [invitee for invitee, error in checked if error is None],
+        )
+        invited = self._get_invited(checked, statuses, response)
+        if invited:
+            rate_limit.take(self.request.user, len(invited))
+            invites = self._create_invites(invited, self.request.user, response)
+            if app_settings.USE_EMAIL_OUTBOX:
+                errors = [None] * len(invites)
+            else:
+                errors = Invitation.send_invitations(invites, self.request)
+                self._delete_failed(invites, errors)
+            self._add_results(invited, errors, response)
+
+    def _create_invites(self, invited, inviter, response):
+        """
+        Creates the invitations of the `invited` addresses, and with
+        ``INVITATIONS_USE_EMAIL_OUTBOX`` queues their e-mails in the same
+        transaction. Otherwise they are committed before being sent, so no
+        locks are held while the mail server is slow and sent links never
+        get rolled back.
+
+        Addresses invited by a concurrent request are removed from
+        `invited`. Returns the invitations in the order of `invited`.
+        """
+        with transaction.atomic():
+            _, created = Invitation.bulk_create_invitations(
+                invited.values(),
+                inviter=inviter,
+                return_invitations=True,
+            )
+            for email, invitee in list(invited.items()):
+                if email not in created:
                     response["invalid"].append({invitee: "pending invite"})
-                except UserRegisteredEmail:
-                    response["invalid"].append({invitee: "user registered email"})
-                else:
-                    invite.inviter = self.request.user
-                    invite.save()
-                    invite.send_invitation(request)
-                    response["valid"].append({invitee: "invited"})
-
+                    del invited[email]
+            invites = [created[email] for email in invited]
+            if app_settings.USE_EMAIL_OUTBOX:
+                Invitation.send_invitations(invites, self.request)
+        return invites
+
+    def _delete_failed(self, invites, errors):
+        # Drop invitations whose e-mail failed so they can be retried.
+        Invitation.objects.filter(
+            pk__in=[
+                invite.pk for invite, error in zip(invites, errors) if error is not None
+            ],
+        ).delete()
+
+    def _stream_results(self, request):
+        """
+        Invites the addresses of an NDJSON body in batches of
+        `stream_batch_size`, yielding one NDJSON line per address.
+        """
+        lines = self._read_lines(request)
+        batch_size = self._get_stream_batch_size(request.user)
+        try:
+            while batch := list(islice(lines, batch_size)):
+                response = {"valid": [], "invalid": []}
+                self._send_invites(self._parse_lines(batch, response), response)
+                yield from self._dump_results(response)
+        except RequestDataTooBig:
+            yield self._dump_line({"error": "payload too large"})
+        except RateLimited as exc:
+            yield self._dump_rate_limited(exc)
+
+    def _get_stream_batch_size(self, inviter):
+        # Batches must fit in the rate limit buckets.
+        max_count = rate_limit.get_max_count(inviter)
+        if max_count is None:
+            return self.stream_batch_size
+        return max(1, min(self.stream_batch_size, max_count))
+
+    def _payload_too_large(self, request):
+        max_size = app_settings.JSON_MAX_PAYLOAD_SIZE
+        try:
+            length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            length = 0
+        return max_size is not None and length > max_size
+
+    def _read_lines(self, request):
+        # Chunked bodies have no Content-Length, so count while reading.
+        max_size = app_settings.JSON_MAX_PAYLOAD_SIZE
+        read = 0
+        while True:
+            if max_size is None:
+                line = request.readline()
+            else:
+                line = request.readline(max_size - read + 1)
+            if not line:
+                return
+            read += len(line)
+            if max_size is not None and read > max_size:
+                raise RequestDataTooBig
+            yield line
+
+    def _parse_lines(self, lines, response):
+        codec = get_json_codec()
+        invitees = []
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                invitee = codec.loads(line)
+            except ValueError:
+                invitee = None
+            if isinstance(invitee, str):
+                invitees.append(invitee)
+            else:
+                line = line.decode(errors="replace")
+                response["invalid"].append({line: "invalid email"})
+        return invitees
+
+    def _check_invitees(self, invitees):
+        checked = []
+        for invitee in invitees:
+            try:
+                validate_email(invitee)
+            except ValidationError as exc:
+                checked.append((invitee, exc))
+            else:
+                checked.append((invitee, None))
+        return checked
+
+    def _get_invited(self, checked, statuses, response):
+        invited = {}
+        for invitee, error in checked:
+            try:
+                if error is not None:
+                    raise error
+                if normalize_email(invitee) in invited:
+                    raise AlreadyInvited
+                if statuses[invitee] is not True:
+                    raise statuses[invitee]
+            except (ValueError, KeyError):
+                pass
+            except ValidationError:
+                metrics.increment(
+                    "invitations_rejected_total",
+                    stage="invite",
+                    reason="invalid",
+                )
+                response["invalid"].append({invitee: "invalid email"})
+            except AlreadyAccepted:
+                response["invalid"].append({invitee: "already accepted"})
+            except AlreadyInvited:
+                response["invalid"].append({invitee: "pending invite"})
+            except UserRegisteredEmail:
+                response["invalid"].append({invitee: "user registered email"})
+            else:
+                invited[normalize_email(invitee)] = invitee
+        return invited
+
+    def _add_results(self, invited, errors, response):
+        for invitee, error in zip(invited.values(), errors):
+            if error is None:
+                response["valid"].append({invitee: "invited"})
+            else:
+                response["invalid"].append({invitee: "sending failed"})
+
+    def _json_response(self, response):
+        status_code = 400
         if response["valid"]:
             status_code = 201
 
         return HttpResponse(
-            json.dumps(response),
+            get_json_codec().dumps(response),
             status=status_code,
             content_type="application/json",
         )
 
+    def _rate_limited_response(self, exc):
+        return HttpResponse(
+            status=429,
+            headers={"Retry-After": str(math.ceil(exc.retry_after))},
+        )
+
+    def _too_many_invitations_response(self, exc):
+        # Waiting wouldn't help, so there is no Retry-After.
+        return HttpResponse(
+            get_json_codec().dumps(
+                {"error": "too many invitations", "limit": exc.limit},
+            ),
+            status=413,
+            content_type="application/json",
+        )
+
+    def _dump_rate_limited(self, exc):
+        return self._dump_line(
+            {"error": "rate limited", "retry_after": math.ceil(exc.retry_after)},
+        )
+
+    def _dump_results(self, response):
+        for result in response["valid"] + response["invalid"]:
+            yield self._dump_line(result)
+
+    def _dump_line(self, data):
+        line = get_json_codec().dumps(data)
+        if isinstance(line, str):
+            line = line.encode()
+        return line + b"\n"
+
+
+class AsyncSendJSONInvite(SendJSONInvite):
+    """
+    Async variant of `SendJSONInvite`, see ``INVITATIONS_ASYNC_VIEWS``.
+    """
+
+    @tracing.traced("invitations.send_json_invite")
+    async def dispatch(self, request, *args, **kwargs):
+        self.user = await request.auser()
+        if not self.user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        if not app_settings.ALLOW_JSON_INVITES:
+            raise Http404
+        return await super(SendJSONInvite, self).dispatch(request, *args, **kwargs)
+
+    async def post(self, request, *args, **kwargs):
+        if self._payload_too_large(request):
+            return HttpResponse(status=413)
+        if request.content_type == NDJSON_CONTENT_TYPE:
+            return StreamingHttpResponse(
+                self._astream_results(request),
+                content_type=NDJSON_CONTENT_TYPE,
+            )
+
+        invitees = get_json_codec().loads(request.body)
+        response = {"valid": [], "invalid": []}
+        if isinstance(invitees, list):
+            try:
+                await self._asend_invites(invitees, response)
+            except RateLimited as exc:
+                return self._rate_limited_response(exc)
+            except TooManyInvitations as exc:
+                return self._too_many_invitations_response(exc)
+        return self._json_response(response)
+
+    async def _asend_invites(self, invitees, response):
+        checked = self._check_invitees(invitees)
+        statuses = await CleanEmailMixin().avalidate_invitations(
+            [invitee for invitee, error in checked if error is None],
+        )
+        invited = self._get_invited(checked, statuses, response)
+        if invited:
+            rate_limit.take(self.user, len(invited))
+            # Transactions need a synchronous connection.
+            invites = await sync_to_async(self._create_invites)(
+                invited,
+                self.user,
+                response,
+            )
+            if app_settings.USE_EMAIL_OUTBOX:
+                errors = [None] * len(invites)
+            else:
+                errors = await Invitation.asend_invitations(invites, self.request)
+                await sync_to_async(self._delete_failed)(invites, errors)
+            self._add_results(invited, errors, response)
+
+    async def _astream_results(self, request):
+        # The ASGI handler has already spooled the body, so reading it
+        # doesn't block on the client.
+        lines = self._read_lines(request)
+        batch_size = self._get_stream_batch_size(self.user)
+        try:
+            while batch := list(islice(lines, batch_size)):
+                response = {"valid": [], "invalid": []}
+                await self._asend_invites(
+                    self._parse_lines(batch, response),
+                    response,
+                )
+                for line in self._dump_results(response):
+                    yield line
+        except RequestDataTooBig:
+            yield self._dump_line({"error": "payload too large"})
+        except RateLimited as exc:
+            yield self._dump_rate_limited(exc)
+
 
 class AcceptInvite(SingleObjectMixin, View):
     form_class = InviteForm
 
     def get_signup_redirect(self):
-        try:
-            signup_redirect = reverse(app_settings.SIGNUP_REDIRECT)
-        except NoReverseMatch:
-            signup_redirect = app_settings.SIGNUP_REDIRECT
+        signup_redirect = app_settings.SIGNUP_REDIRECT_URL
         if next_ := self.request.GET.get(REDIRECT_FIELD_NAME):
             signup_redirect += f"?{REDIRECT_FIELD_NAME}={next_}"
         return signup_redirect
 
     def get_login_redirect(self):
-        try:
-            login_redirect = reverse(app_settings.LOGIN_REDIRECT)
-        except NoReverseMatch:
-            login_redirect = app_settings.LOGIN_REDIRECT
+        login_redirect = app_settings.LOGIN_REDIRECT_URL
         if next_ := self.request.GET.get(REDIRECT_FIELD_NAME):
             login_redirect += f"?{REDIRECT_FIELD_NAME}={next_}"
         return login_redirect
 
+    @tracing.traced("invitations.accept_invite")
+    def dispatch(self, request, *args, **kwargs):
+        with metrics.timer("invitations_accept_seconds"):
+            return super().dispatch(request, *args, **kwargs)
+
     def get(self, *args, **kwargs):
         if app_settings.CONFIRM_INVITE_ON_GET:
             return self.post(*args, **kwargs)
@@ -132,6 +512,7 @@ class AcceptInvite(SingleObjectMixin, View):
 
     def post(self, *args, **kwargs):
         self.object = invitation = self.get_object()
+        self._count_rejection(invitation)
 
         # Compatibility with older versions: return an HTTP 410 GONE if there
         # is an error. # Error conditions are: no key, expired key or
@@ -185,39 +566,258 @@ class AcceptInvite(SingleObjectMixin, View):
         logout(self.request)
 
         # Mark it as accepted now if ACCEPT_INVITE_AFTER_SIGNUP is False.
-        if not app_settings.ACCEPT_INVITE_AFTER_SIGNUP:
-            accept_invitation(
-                invitation=invitation,
-                request=self.request,
-                signal_sender=self.__class__,
-            )
+        if not app_settings.ACCEPT_INVITE_AFTER_SIGNUP and not accept_invitation(
+            invitation=invitation,
+            request=self.request,
+            signal_sender=self.__class__,
+        ):
+            return self._accepted_concurrently_response(invitation)
 
         get_invitations_adapter().stash_verified_email(self.request, invitation.email)
 
         return HttpResponseRedirect(self.get_signup_redirect())
 
+    def _count_rejection(self, invitation):
+        if not invitation:
+            reason = "invalid"
+        elif invitation.accepted:
+            reason = "accepted"
+        elif invitation.key_expired():
+            reason = "expired"
+        else:
+            return
+        metrics.increment("invitations_rejected_total", stage="accept", reason=reason)
+
+    def _accepted_concurrently_response(self, invitation):
+        # Another request accepted the invitation since it was fetched.
+        metrics.increment(
+            "invitations_rejected_total",
+            stage="accept",
+            reason="accepted",
+        )
+        if app_settings.GONE_ON_ACCEPT_ERROR:
+            return HttpResponse(status=410)
+        get_invitations_adapter().add_message(
+            self.request,
+            messages.ERROR,
+            "invitations/messages/invite_already_accepted.txt",
+            {"email": invitation.email},
+        )
+        return HttpResponseRedirect(self.get_login_redirect())
+
     def get_object(self, queryset=None):
         if queryset is None:
             queryset = self.get_queryset()
+        key = self._get_lookup_key()
+        if key is None:
+            return None
+        cached, invitation = self._get_cached_object(queryset, key)
+        if cached:
+            return invitation
+
         try:
-            return queryset.get(key=self.kwargs["key"].lower())
+            with tracing.span("invitations.lookup"):
+                with metrics.timer("invitations_lookup_seconds"):
+                    invitation = queryset.get(key=key)
         except Invitation.DoesNotExist:
+            state_cache.set_unknown(key)
             return None
+        state_cache.set_state(invitation)
+        return invitation
+
+    def _get_lookup_key(self):
+        """
+        Returns the key to look up, or ``None`` if no invitation can have it.
+        """
+        key = self.kwargs["key"]
+        if is_signed_key(key):
+            # Reject tampered, malformed and expired keys without a query.
+            # Expired keys are still looked up to show the expired message.
+            try:
+                check_signed_key(key)
+            except signing.SignatureExpired:
+                if app_settings.GONE_ON_ACCEPT_ERROR:
+                    return None
+            except signing.BadSignature:
+                return None
+        else:
+            key = key.lower()
+
+        if not key_filter.might_exist(key):
+            return None
+        return key
+
+    def _get_cached_object(self, queryset, key):
+        """
+        Returns whether the state cache answered for `key`, and the answer.
+        """
+        # Known bad keys and accepted or expired invitations are answered
+        # from the state cache, with an unsaved stand-in for the invitation.
+        state = state_cache.get_state(key)
+        if state == state_cache.UNKNOWN:
+            return True, None
+        if state is not None:
+            invitation = queryset.model(key=key, **state)
+            if invitation.accepted or (invitation.sent and invitation.key_expired()):
+                return True, invitation
+        return False, None
 
     def get_queryset(self):
         return Invitation.objects.all()
 
 
+class AsyncAcceptInvite(AcceptInvite):
+    """
+    Async variant of `AcceptInvite`, see ``INVITATIONS_ASYNC_VIEWS``.
+    """
+
+    @tracing.traced("invitations.accept_invite")
+    async def dispatch(self, request, *args, **kwargs):
+        with metrics.timer("invitations_accept_seconds"):
+            return await super(AcceptInvite, self).dispatch(request, *args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        if app_settings.CONFIRM_INVITE_ON_GET:
+            return await self.post(*args, **kwargs)
+        else:
+            return HttpResponseNotAllowed(["GET"], _("405 Method Not Allowed"))
+
+    async def post(self, *args, **kwargs):
+        self.object = invitation = await self.aget_object()
+        self._count_rejection(invitation)
+        adapter = get_invitations_adapter()
+
+        if app_settings.GONE_ON_ACCEPT_ERROR and (
+            not invitation
+            or (invitation and (invitation.accepted or invitation.key_expired()))
+        ):
+            return HttpResponse(status=410)
+
+        if not invitation:
+            adapter.add_message(
+                self.request,
+                messages.ERROR,
+                "invitations/messages/invite_invalid.txt",
+            )
+            return HttpResponseRedirect(self.get_login_redirect())
+
+        if invitation.accepted:
+            await alogout(self.request)
+            adapter.add_message(
+                self.request,
+                messages.ERROR,
+                "invitations/messages/invite_already_accepted.txt",
+                {"email": invitation.email},
+            )
+            return HttpResponseRedirect(self.get_login_redirect())
+
+        if invitation.key_expired():
+            await alogout(self.request)
+            adapter.add_message(
+                self.request,
+                messages.ERROR,
+                "invitations/messages/invite_expired.txt",
+                {"email": invitation.email},
+            )
+            return HttpResponseRedirect(self.get_signup_redirect())
+
+        await alogout(self.request)
+
+        if not app_settings.ACCEPT_INVITE_AFTER_SIGNUP and not (
+            await aaccept_invitation(
+                invitation=invitation,
+                request=self.request,
+                signal_sender=self.__class__,
+            )
+        ):
+            return self._accepted_concurrently_response(invitation)
+
+        if hasattr(adapter, "astash_verified_email"):
+            await adapter.astash_verified_email(self.request, invitation.email)
+        else:
+            # Adapters of the legacy allauth integration are synchronous.
+            await sync_to_async(adapter.stash_verified_email)(
+                self.request,
+                invitation.email,
+            )
+
+        return HttpResponseRedirect(self.get_signup_redirect())
+
+    async def aget_object(self, queryset=None):
+        if queryset is None:
+            queryset = self.get_queryset()
+        key = self._get_lookup_key()
+        if key is None:
+            return None
+        cached, invitation = self._get_cached_object(queryset, key)
+        if cached:
+            return invitation
+
+        try:
+            with tracing.span("invitations.lookup"):
+                with metrics.timer("invitations_lookup_seconds"):
+                    invitation = await queryset.aget(key=key)
+        except Invitation.DoesNotExist:
+            state_cache.set_unknown(key)
+            return None
+        state_cache.set_state(invitation)
+        return invitation
+
+
+class InvitationMetrics(View):
+    """
+    Serves the metrics of ``INVITATIONS_METRICS_COLLECTOR`` in the
+    Prometheus text exposition format. It isn't part of `invitations.urls`,
+    route and protect it in the project.
+    """
+
+    content_type = "text/plain; version=0.0.4; charset=utf-8"
+
+    def get(self, request, *args, **kwargs):
+        collector = metrics.get_collector()
+        if collector is None:
+            raise Http404
+        return HttpResponse(collector.render(), content_type=self.content_type)
+
+
+@tracing.traced("invitations.accept_invitation")
 def accept_invitation(invitation, request, signal_sender):
-    invitation.accepted = True
-    invitation.save()
-
-    invite_accepted.send(
-        sender=signal_sender,
-        email=invitation.email,
-        request=request,
-        invitation=invitation,
+    """
+    Accepts `invitation` and notifies about it. Returns ``False``, without
+    notifying, if it was already accepted or has expired.
+    """
+    if not invitation.accept():
+        return False
+
+    with tracing.span("invitations.invite_accepted"):
+        invite_accepted.send(
+            sender=signal_sender,
+            email=invitation.email,
+            request=request,
+            invitation=invitation,
+        )
+
+    get_invitations_adapter().add_message(
+        request,
+        messages.SUCCESS,
+        "invitations/messages/invite_accepted.txt",
+        {"email": invitation.email},
     )
+    return True
+
+
+@tracing.traced("invitations.accept_invitation")
+async def aaccept_invitation(invitation, request, signal_sender):
+    if not await invitation.aaccept():
+        return False
+
+    with tracing.span("invitations.invite_accepted"):
+        await invite_accepted.asend(
+            sender=signal_sender,
+            email=invitation.email,
+            request=request,
+            invitation=invitation,
+        )
 
     get_invitations_adapter().add_message(
         request,
@@ -225,10 +825,13 @@ def accept_invitation(invitation, request, signal_sender):
         "invitations/messages/invite_accepted.txt",
         {"email": invitation.email},
     )
+    return True
 
 
 def accept_invite_after_signup(sender, request, user, **kwargs):
-    invitation = Invitation.objects.filter(email__iexact=user.email).first()
+    invitation = Invitation.objects.filter(
+        normalized_email=normalize_email(user.email),
+    ).first()
     if invitation:
         accept_invitation(
             invitation=invitation,
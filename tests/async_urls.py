@@ -0,0 +1,31 @@
+from django.urls import include, path, re_path
+
+from invitations import views
+
+urlpatterns = [
+    path(
+        "invitations/",
+        include(
+            (
+                [
+                    path(
+                        "send-invite/",
+                        views.AsyncSendInvite.as_view(),
+                        name="send-invite",
+                    ),
+                    path(
+                        "send-json-invite/",
+                        views.AsyncSendJSONInvite.as_view(),
+                        name="send-json-invite",
+                    ),
+                    re_path(
+                        r"^accept-invite/(?P<key>[\w.-]+)/?$",
+                        views.AsyncAcceptInvite.as_view(),
+                        name="accept-invite",
+                    ),
+                ],
+                "invitations",
+            ),
+        ),
+    ),
+]
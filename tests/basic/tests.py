@@ -1,11 +1,22 @@
 import datetime
+import importlib
 import json
+import os
 import re
+import stat
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import StringIO
+from types import SimpleNamespace
 from unittest.mock import patch
 
-from django.test import Client
+from asgiref.sync import async_to_sync
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.test import AsyncClient, Client
 from django.test.client import RequestFactory
-from django.test.utils import override_settings
+from django.test.utils import CaptureQueriesContext, override_settings
 from django.utils import timezone
 
 try:
@@ -16,17 +27,58 @@ except ImportError:
 import pytest
 from django.contrib.auth.models import AnonymousUser
 from django.core import mail
+from django.core.cache import caches
+from django.core.mail import get_connection
+from django.http import Http404
+from django.template import TemplateDoesNotExist
+from django.template.loader import get_template
 from freezegun import freeze_time
 
-from invitations.adapters import BaseInvitationsAdapter, get_invitations_adapter
+from invitations import key_filter, metrics, rate_limit, state_cache, tracing
+from invitations.adapters import (
+    BaseInvitationsAdapter,
+    clear_template_cache,
+    get_invitations_adapter,
+)
+from invitations.admin import EstimatedCountPaginator, InvitationAdmin
 from invitations.app_settings import app_settings
-from invitations.forms import InviteForm
+from invitations.checks import check_invitation_model, check_key_filter_cache
+from invitations.exceptions import (
+    AlreadyAccepted,
+    AlreadyInvited,
+    RateLimited,
+    TooManyInvitations,
+    UserRegisteredEmail,
+)
+from invitations.forms import CleanEmailMixin, InviteForm
+from invitations.key_filter import BloomFilter
+from invitations.managers import (
+    INVITATION_ACCEPTED,
+    INVITATION_CREATED,
+    INVITATION_PENDING,
+    INVITATION_REGISTERED,
+)
+from invitations.models import PendingInvitationEmail
 from invitations.utils import get_invitation_model
-from invitations.views import AcceptInvite, SendJSONInvite
+from invitations.views import (
+    AcceptInvite,
+    InvitationMetrics,
+    SendInvite,
+    SendJSONInvite,
+)
 
 Invitation = get_invitation_model()
 
 
+class CustomInvitationsAdapter(BaseInvitationsAdapter):
+    pass
+
+
+class LegacyInviteForm(InviteForm):
+    def save(self, email):
+        return Invitation.create(email=email)
+
+
 class TestInvitationModel:
     @freeze_time("2015-07-30 12:00:06")
     def test_create_invitation(self, invitation_a):
@@ -48,6 +100,60 @@ class TestInvitationModel:
         )
         assert invitation_a.key_expired() is False
 
+        # Not sent yet, e.g. while its queued e-mail is delivered.
+        invitation_a.sent = None
+        assert invitation_a.key_expired() is False
+
+    def test_normalized_email_is_unique(self, invitation_a):
+        assert invitation_a.normalized_email == "email@example.com"
+        with pytest.raises(IntegrityError):
+            Invitation.create(" Email@Example.com")
+
+    def test_invitation_model_check(self):
+        assert check_invitation_model(None) == []
+        with patch(
+            "invitations.checks.get_invitation_model",
+            return_value=get_user_model(),
+        ):
+            assert [error.id for error in check_invitation_model(None)] == [
+                "invitations.E001",
+            ]
+
+    def test_normalized_email_migration_collisions(self, invitation_a):
+        migration = importlib.import_module(
+            "invitations.migrations.0006_invitation_normalized_email",
+        )
+        schema_editor = SimpleNamespace(connection=connection)
+        # Backfilled like new invitations, including non-ASCII characters
+        # and whitespace that SQLite's LOWER and TRIM leave alone.
+        Invitation.objects.filter(pk=invitation_a.pk).update(
+            email="\tÉmile@Example.com\n",
+            normalized_email="",
+        )
+        migration.populate_normalized_email(apps, schema_editor)
+        invitation_a.refresh_from_db()
+        assert invitation_a.normalized_email == "émile@example.com"
+
+        Invitation.create("other@example.com")
+        Invitation.objects.filter(email="other@example.com").update(
+            email="ÉMILE@example.com",
+        )
+        with pytest.raises(RuntimeError, match="Émile@Example.com\n, ÉMILE@"):
+            migration.populate_normalized_email(apps, schema_editor)
+
+    def test_accept(self, django_assert_num_queries, sent_invitation_by_user_a):
+        stale = Invitation.objects.get(pk=sent_invitation_by_user_a.pk)
+        with django_assert_num_queries(1):
+            assert sent_invitation_by_user_a.accept() is True
+        assert sent_invitation_by_user_a.accepted is True
+        assert stale.accept() is False
+        assert stale.accepted is False
+
+    def test_accept_expired(self, expired_invitation):
+        assert expired_invitation.accept() is False
+        expired_invitation.refresh_from_db()
+        assert expired_invitation.accepted is False
+
     def test_invitation_related_name(self, sent_invitation_by_user_a):
         user = sent_invitation_by_user_a.inviter
         assert user.invitations_invitations.all()
@@ -62,11 +168,35 @@ class TestInvitationModel:
         )
 
 
+class TestAppSettings:
+    def test_settings_are_cached_until_changed(self, settings):
+        settings.INVITATIONS_INVITATION_EXPIRY = 5
+        assert app_settings.INVITATION_EXPIRY_DELTA == datetime.timedelta(days=5)
+        assert vars(app_settings)["INVITATION_EXPIRY"] == 5
+
+        settings.INVITATIONS_INVITATION_EXPIRY = 1
+        assert "INVITATION_EXPIRY" not in vars(app_settings)
+        assert app_settings.INVITATION_EXPIRY_DELTA == datetime.timedelta(days=1)
+
+    def test_redirect_urls_are_resolved(self, settings):
+        settings.INVITATIONS_LOGIN_REDIRECT = "admin:index"
+        settings.INVITATIONS_SIGNUP_REDIRECT = "/signup-url/"
+        assert app_settings.LOGIN_REDIRECT_URL == reverse("admin:index")
+        assert app_settings.SIGNUP_REDIRECT_URL == "/signup-url/"
+
+
 class TestInvitationsAdapter:
     def test_fetch_adapter(self):
         adapter = get_invitations_adapter()
         assert isinstance(adapter, BaseInvitationsAdapter)
 
+    def test_adapter_is_cached(self, settings):
+        adapter = get_invitations_adapter()
+        assert get_invitations_adapter() is adapter
+
+        settings.INVITATIONS_ADAPTER = "tests.basic.tests.CustomInvitationsAdapter"
+        assert isinstance(get_invitations_adapter(), CustomInvitationsAdapter)
+
     def test_email_subject_prefix_settings_with_site(self):
         adapter = get_invitations_adapter()
         result = adapter.format_email_subject("Bar", context={"site_name": "Foo.com"})
@@ -78,6 +208,89 @@ class TestInvitationsAdapter:
         result = adapter.format_email_subject("Bar", context={"site_name": "Foo.com"})
         assert result == "Bar"
 
+    def test_render_mail_caches_templates(self, settings):
+        clear_template_cache()
+        adapter = get_invitations_adapter()
+        context = {"site_name": "Foo.com", "invite_url": "/accept/"}
+        with patch(
+            "invitations.adapters.get_template",
+            wraps=get_template,
+        ) as mock_get_template:
+            adapter.render_mail("invitations/email/email_invite", "a@b.com", context)
+            msg = adapter.render_mail(
+                "invitations/email/email_invite",
+                "a@b.com",
+                context,
+            )
+            # Subject, the missing html body and the txt body.
+            assert mock_get_template.call_count == 3
+
+            settings.INVITATIONS_EMAIL_SUBJECT_PREFIX = "[Foo] "
+            msg = adapter.render_mail(
+                "invitations/email/email_invite",
+                "a@b.com",
+                context,
+            )
+            assert mock_get_template.call_count == 6
+
+        assert msg.subject == "[Foo] Invitation to join Foo.com"
+        assert "/accept/" in msg.body
+
+    def test_send_mails_reuses_connection(self):
+        adapter = get_invitations_adapter()
+        context = {"site_name": "Foo.com", "invite_url": "/accept/"}
+        with patch(
+            "invitations.adapters.get_connection",
+            wraps=get_connection,
+        ) as mock_get_connection:
+            errors = adapter.send_mails(
+                [
+                    ("invitations/email/email_invite", "one@example.com", context),
+                    ("invitations/email/missing", "two@example.com", context),
+                    ("invitations/email/email_invite", "three@example.com", context),
+                ],
+            )
+
+        assert mock_get_connection.call_count == 1
+        assert errors[0] is None
+        assert isinstance(errors[1], TemplateDoesNotExist)
+        assert errors[2] is None
+        assert [message.to for message in mail.outbox] == [
+            ["one@example.com"],
+            ["three@example.com"],
+        ]
+
+    def test_send_mails_renders_in_processes(self, settings):
+        settings.INVITATIONS_RENDER_PROCESSES = 2
+        settings.INVITATIONS_METRICS_COLLECTOR = "invitations.metrics.InMemoryCollector"
+        adapter = get_invitations_adapter()
+        context = {"site_name": "Foo.com", "invite_url": "/accept/"}
+        mails = [
+            ("invitations/email/email_invite", f"{i}@example.com", context)
+            for i in range(10)
+        ]
+        mails[3] = ("invitations/email/missing", "3@example.com", context)
+        with (
+            patch.object(adapter, "parallel_render_threshold", 5),
+            patch(
+                "invitations.adapters.ProcessPoolExecutor",
+                wraps=ProcessPoolExecutor,
+            ) as mock_executor,
+        ):
+            errors = adapter.send_mails(mails)
+            # The pool is reused by later batches.
+            adapter.render_mails(mails)
+
+        assert mock_executor.call_count == 1
+        output = metrics.get_collector().render()
+        assert "invitations_parallel_render_seconds_count 2" in output
+        assert "invitations_render_seconds" not in output
+        assert isinstance(errors[3], TemplateDoesNotExist)
+        assert errors[:3] + errors[4:] == [None] * 9
+        assert [message.to for message in mail.outbox] == [
+            [f"{i}@example.com"] for i in range(10) if i != 3
+        ]
+
 
 class TestInvitationsSendView:
     client = Client()
@@ -131,6 +344,39 @@ class TestInvitationsSendView:
             kwargs={"key": invitation.key},
         )
 
+    def test_valid_form_submission_with_legacy_form(self, user_a):
+        self.client.login(username="flibble", password="password")
+        with patch.object(SendInvite, "form_class", LegacyInviteForm):
+            resp = self.client.post(
+                reverse("invitations:send-invite"),
+                {"email": "email@example.com"},
+            )
+
+        assert "success_message" in resp.context_data
+        assert Invitation.objects.get().inviter == user_a
+        assert len(mail.outbox) == 1
+
+    def test_valid_form_submission_writes(self, user_a):
+        self.client.login(username="flibble", password="password")
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post(
+                reverse("invitations:send-invite"),
+                {"email": "email@example.com"},
+            )
+        writes = [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith(("INSERT", "UPDATE"))
+            and Invitation._meta.db_table in query["sql"]
+        ]
+
+        assert len(writes) == 2
+        assert writes[0].startswith("INSERT")
+        assert writes[1].startswith(
+            f'UPDATE "{Invitation._meta.db_table}" SET "sent" = ',
+        )
+        assert Invitation.objects.get().inviter == user_a
+
     @override_settings(INVITATION_MODEL="ExampleSwappableInvitation")
     @freeze_time("2015-07-30 12:00:06")
     def test_valid_form_submission_with_swapped_model(self, user_a):
@@ -157,6 +403,102 @@ class TestInvitationsSendView:
         )
 
 
+class TestInvitationsOutbox:
+    client = Client()
+
+    def test_send_invite_queues_email(self, settings, user_a):
+        settings.INVITATIONS_USE_EMAIL_OUTBOX = True
+        self.client.login(username="flibble", password="password")
+        self.client.post(
+            reverse("invitations:send-invite"),
+            {"email": "email@example.com"},
+        )
+        invitation = Invitation.objects.get(email="email@example.com")
+        pending = PendingInvitationEmail.objects.get()
+
+        assert pending.invitation_id == invitation.pk
+        assert pending.context["invite_url"].endswith(invitation.key)
+        assert invitation.sent is None
+        assert len(mail.outbox) == 0
+
+        out = StringIO()
+        call_command("send_pending_invitations", stdout=out)
+        invitation.refresh_from_db()
+
+        assert out.getvalue() == "Sent 1 invitations, 0 failed.\n"
+        assert invitation.sent
+        assert len(mail.outbox) == 1
+        assert mail.outbox[0].to == ["email@example.com"]
+        assert not PendingInvitationEmail.objects.exists()
+
+    def test_json_invite_queues_emails(self, settings, user_a):
+        settings.INVITATIONS_USE_EMAIL_OUTBOX = True
+        settings.INVITATIONS_ALLOW_JSON_INVITES = True
+        self.client.login(username="flibble", password="password")
+        response = self.client.post(
+            reverse("invitations:send-json-invite"),
+            data=json.dumps(["one@example.com", "two@example.com"]),
+            content_type="application/json",
+        )
+
+        assert response.status_code == 201
+        assert PendingInvitationEmail.objects.count() == 2
+        assert len(mail.outbox) == 0
+
+    def test_send_pending_retries_failures(self, settings, invitation_b):
+        settings.INVITATIONS_USE_EMAIL_OUTBOX = True
+        invitation_b.send_invitation(RequestFactory().get("/"))
+
+        with patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=ConnectionRefusedError("relay down"),
+        ):
+            sent, failed = PendingInvitationEmail.objects.send_pending()
+        pending = PendingInvitationEmail.objects.get()
+        invitation_b.refresh_from_db()
+
+        assert (sent, failed) == (0, 1)
+        assert pending.attempts == 1
+        assert pending.last_error == "relay down"
+        assert pending.next_attempt > timezone.now()
+        assert invitation_b.sent is None
+        # Not picked up again before the retry delay has passed.
+        assert PendingInvitationEmail.objects.send_pending() == (0, 0)
+
+    def test_send_pending_uses_current_key(self, settings, invitation_b):
+        settings.INVITATIONS_USE_EMAIL_OUTBOX = True
+        invitation_b.send_invitation(RequestFactory().get("/"))
+        old_key = invitation_b.key
+        Invitation.objects.filter(pk=invitation_b.pk).update(key="newkey")
+        PendingInvitationEmail.objects.send_pending()
+
+        body = mail.outbox[0].body
+        assert "http://testserver/invitations/accept-invite/newkey" in body
+        assert old_key not in body
+
+    def test_send_pending_deletes_undeliverable_invitations(
+        self,
+        settings,
+        invitation_b,
+        sent_invitation_by_user_a,
+    ):
+        settings.INVITATIONS_USE_EMAIL_OUTBOX = True
+        request = RequestFactory().get("/")
+        invitation_b.send_invitation(request)
+        sent_invitation_by_user_a.send_invitation(request)
+
+        with patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=ConnectionRefusedError("relay down"),
+        ):
+            sent, failed = PendingInvitationEmail.objects.send_pending(max_attempts=1)
+
+        assert (sent, failed) == (0, 2)
+        # The resent invitation is kept, and its entry stays for inspection.
+        assert list(Invitation.objects.all()) == [sent_invitation_by_user_a]
+        assert PendingInvitationEmail.objects.get().attempts == 1
+
+
 @pytest.mark.django_db
 class TestInvitationsAcceptView:
     client = Client()
@@ -358,6 +700,740 @@ class TestInvitationsAcceptView:
         assert resp.request["PATH_INFO"] == "/non-existent-url/"
 
 
+@pytest.mark.django_db
+class TestInvitationsStateCache:
+    client = Client()
+
+    @pytest.fixture(autouse=True)
+    def use_state_cache(self, settings):
+        settings.INVITATIONS_STATE_CACHE = "default"
+        caches["default"].clear()
+
+    def test_unknown_key(self, django_assert_num_queries):
+        url = reverse(app_settings.CONFIRMATION_URL_NAME, kwargs={"key": "invalidKey"})
+        with django_assert_num_queries(1):
+            assert self.client.get(url).status_code == 410
+        with django_assert_num_queries(0):
+            assert self.client.get(url).status_code == 410
+
+    def test_unknown_key_saved(self):
+        url = reverse(app_settings.CONFIRMATION_URL_NAME, kwargs={"key": "somekey"})
+        assert self.client.get(url).status_code == 410
+
+        invitation = Invitation.create("email@example.com")
+        invitation.key = "somekey"
+        invitation.sent = timezone.now()
+        invitation.save()
+        assert self.client.get(url).status_code == 302
+
+    def test_accepted_key(self, django_assert_num_queries, accepted_invitation):
+        url = reverse(
+            app_settings.CONFIRMATION_URL_NAME,
+            kwargs={"key": accepted_invitation.key},
+        )
+        with django_assert_num_queries(1):
+            assert self.client.get(url).status_code == 410
+        with django_assert_num_queries(0):
+            assert self.client.get(url).status_code == 410
+
+    def test_accept_invalidates_state(self, settings, sent_invitation_by_user_a):
+        settings.INVITATIONS_SIGNUP_REDIRECT = "/non-existent-url/"
+        url = reverse(
+            app_settings.CONFIRMATION_URL_NAME,
+            kwargs={"key": sent_invitation_by_user_a.key},
+        )
+        assert self.client.get(url).status_code == 302
+        assert self.client.get(url).status_code == 410
+
+
+@pytest.mark.django_db
+class TestInvitationsSignedKeys:
+    client = Client()
+
+    @pytest.fixture(autouse=True)
+    def signed_keys(self, settings):
+        settings.INVITATIONS_SIGNED_KEYS = True
+        settings.INVITATIONS_SIGNUP_REDIRECT = "/non-existent-url/"
+
+    def test_accept_signed_key(self, user_a):
+        invitation = Invitation.create("email@example.com", inviter=user_a)
+        invitation.send_invitation(RequestFactory().get("/"))
+
+        assert len(invitation.key) <= 64
+        assert invitation.key.count(".") == 2
+        url = re.search(r"(?P<url>/invitations/[^\s]+)", mail.outbox[0].body).group(
+            "url",
+        )
+        resp = self.client.get(url, follow=True)
+        invitation.refresh_from_db()
+
+        assert resp.request["PATH_INFO"] == "/non-existent-url/"
+        assert invitation.accepted is True
+
+    @pytest.mark.parametrize(
+        "tamper",
+        [
+            lambda key: key[:-1] + ("A" if key[-1] != "A" else "B"),
+            lambda key: key.lower(),
+            lambda key: "a.b.c",
+        ],
+    )
+    def test_tampered_key_is_rejected_without_query(
+        self,
+        django_assert_num_queries,
+        sent_invitation_by_user_a,
+        tamper,
+    ):
+        url = reverse(
+            app_settings.CONFIRMATION_URL_NAME,
+            kwargs={"key": tamper(sent_invitation_by_user_a.key)},
+        )
+        with django_assert_num_queries(0):
+            assert self.client.get(url).status_code == 410
+
+    def test_expired_key_is_rejected_without_query(
+        self,
+        django_assert_num_queries,
+        user_a,
+    ):
+        with freeze_time("2015-07-30 12:00:06"):
+            invitation = Invitation.create("email@example.com", inviter=user_a)
+        invitation.sent = timezone.now()
+        invitation.save()
+
+        assert invitation.key_expired() is True
+        url = reverse(
+            app_settings.CONFIRMATION_URL_NAME,
+            kwargs={"key": invitation.key},
+        )
+        with django_assert_num_queries(0):
+            assert self.client.get(url).status_code == 410
+
+
+class TestBloomFilter:
+    def test_membership(self):
+        key_filter = BloomFilter.for_capacity(1000, 0.01)
+        keys = [f"key{i}" for i in range(1000)]
+        for key in keys:
+            key_filter.add(key)
+
+        assert all(key in key_filter for key in keys)
+        false_positives = sum(f"other{i}" in key_filter for i in range(10000))
+        assert false_positives < 300
+
+    def test_serialization(self):
+        key_filter = BloomFilter.for_capacity(10, 0.01)
+        key_filter.add("key")
+        loaded = BloomFilter.from_bytes(key_filter.to_bytes())
+
+        assert "key" in loaded
+        assert (loaded.size, loaded.hash_count, loaded.built_at) == (
+            key_filter.size,
+            key_filter.hash_count,
+            key_filter.built_at,
+        )
+
+
+@pytest.mark.django_db
+class TestInvitationsKeyFilter:
+    client = Client()
+
+    @pytest.fixture(autouse=True)
+    def key_filter_path(self, settings, tmp_path):
+        settings.INVITATIONS_KEY_FILTER_PATH = str(tmp_path / "keys.bloom")
+        caches["default"].clear()
+        return settings.INVITATIONS_KEY_FILTER_PATH
+
+    def test_unknown_key_is_rejected_without_query(
+        self,
+        django_assert_num_queries,
+        accepted_invitation,
+    ):
+        call_command("build_invitation_key_filter", stdout=StringIO())
+        unknown_url = reverse(
+            app_settings.CONFIRMATION_URL_NAME,
+            kwargs={"key": "invalidKey"},
+        )
+        known_url = reverse(
+            app_settings.CONFIRMATION_URL_NAME,
+            kwargs={"key": accepted_invitation.key},
+        )
+        with django_assert_num_queries(0):
+            assert self.client.get(unknown_url).status_code == 410
+        with django_assert_num_queries(1):
+            assert self.client.get(known_url).status_code == 410
+
+    def test_keys_created_after_build(self, settings, user_a):
+        settings.INVITATIONS_SIGNUP_REDIRECT = "/non-existent-url/"
+        call_command("build_invitation_key_filter", stdout=StringIO())
+        invitation = Invitation.create("email@example.com", inviter=user_a)
+        invitation.sent = timezone.now()
+        invitation.save()
+        # Another process loads the filter from disk.
+        key_filter._loaded = None
+
+        url = reverse(
+            app_settings.CONFIRMATION_URL_NAME,
+            kwargs={"key": invitation.key},
+        )
+        assert self.client.get(url).status_code == 302
+
+    def test_stale_filter_is_ignored(self, settings, accepted_invitation):
+        with freeze_time("2015-07-30 12:00:06"):
+            call_command("build_invitation_key_filter", stdout=StringIO())
+        assert key_filter.might_exist("invalidKey") is True
+
+    def test_filter_is_readable_by_others(self, key_filter_path):
+        call_command("build_invitation_key_filter", stdout=StringIO())
+        umask = os.umask(0)
+        os.umask(umask)
+        assert stat.S_IMODE(os.stat(key_filter_path).st_mode) == 0o666 & ~umask
+
+    @pytest.mark.parametrize("size", [0, 10, 40])
+    def test_corrupt_filter_is_ignored(self, key_filter_path, size):
+        call_command("build_invitation_key_filter", stdout=StringIO())
+        with open(key_filter_path, "rb") as f:
+            data = f.read()
+        with open(key_filter_path, "wb") as f:
+            f.write(data[:size])
+        key_filter._loaded = None
+
+        assert key_filter.might_exist("invalidKey") is True
+
+    def test_lost_cache_falls_through_to_database(self, accepted_invitation):
+        call_command("build_invitation_key_filter", stdout=StringIO())
+        assert key_filter.might_exist("invalidKey") is False
+        # Keys created since the build may have been lost with the cache.
+        caches["default"].clear()
+        assert key_filter.might_exist("invalidKey") is True
+
+    def test_process_local_cache_check(self, settings):
+        assert check_key_filter_cache(None) != []
+        settings.CACHES = {
+            "default": {
+                "BACKEND": "django.core.cache.backends.memcached.PyMemcacheCache",
+                "LOCATION": "127.0.0.1:11211",
+            },
+        }
+        assert check_key_filter_cache(None) == []
+        settings.INVITATIONS_KEY_FILTER_PATH = None
+        settings.CACHES = {
+            "default": {"BACKEND": "django.core.cache.backends.dummy.DummyCache"},
+        }
+        assert check_key_filter_cache(None) == []
+
+
+@pytest.mark.django_db
+class TestInvitationsRateLimit:
+    client = Client()
+
+    @pytest.fixture(autouse=True)
+    def clear_cache(self, settings):
+        settings.INVITATIONS_INVITER_RATE = 1
+        settings.INVITATIONS_INVITER_BURST = 2
+        caches["default"].clear()
+
+    def test_take(self, settings, user_a, user_b):
+        settings.INVITATIONS_GLOBAL_RATE = 1
+        settings.INVITATIONS_GLOBAL_BURST = 3
+        with freeze_time("2015-07-30 12:00:00") as frozen_time:
+            rate_limit.take(user_a, 2)
+            with pytest.raises(RateLimited) as exc_info:
+                rate_limit.take(user_a)
+            assert exc_info.value.retry_after == 1
+
+            # The site only has one invitation left.
+            with pytest.raises(RateLimited):
+                rate_limit.take(user_b, 2)
+            rate_limit.take(user_b)
+
+            frozen_time.tick(2)
+            rate_limit.take(user_a, 2)
+
+    def test_take_more_than_burst(self, settings, user_a):
+        settings.INVITATIONS_GLOBAL_RATE = 1
+        settings.INVITATIONS_GLOBAL_BURST = 10
+        assert rate_limit.get_max_count(user_a) == 2
+        with pytest.raises(TooManyInvitations) as exc_info:
+            rate_limit.take(user_a, 3)
+        assert exc_info.value.limit == 2
+        # Nothing was taken.
+        rate_limit.take(user_a, 2)
+
+    def test_json_invite(self, settings, user_a):
+        settings.INVITATIONS_ALLOW_JSON_INVITES = True
+        self.client.login(username="flibble", password="password")
+        self.client.post(
+            reverse("invitations:send-json-invite"),
+            data=json.dumps(["one@example.com", "two@example.com"]),
+            content_type="application/json",
+        )
+        response = self.client.post(
+            reverse("invitations:send-json-invite"),
+            data=json.dumps(["3@example.com"]),
+            content_type="application/json",
+        )
+
+        assert response.status_code == 429
+        assert int(response["Retry-After"]) >= 1
+        assert Invitation.objects.count() == 2
+
+    def test_json_invite_more_than_burst(self, settings, user_a):
+        settings.INVITATIONS_ALLOW_JSON_INVITES = True
+        self.client.login(username="flibble", password="password")
+        response = self.client.post(
+            reverse("invitations:send-json-invite"),
+            data=json.dumps(["one@example.com", "two@example.com", "3@example.com"]),
+            content_type="application/json",
+        )
+
+        assert response.status_code == 413
+        assert "Retry-After" not in response
+        assert json.loads(response.content) == {
+            "error": "too many invitations",
+            "limit": 2,
+        }
+        assert not Invitation.objects.exists()
+        assert len(mail.outbox) == 0
+
+    def test_ndjson_invite_batches_fit_burst(self, settings, user_a):
+        settings.INVITATIONS_ALLOW_JSON_INVITES = True
+        self.client.login(username="flibble", password="password")
+        with freeze_time("2015-07-30 12:00:00"):
+            response = self.client.post(
+                reverse("invitations:send-json-invite"),
+                data='"one@example.com"\n"two@example.com"\n"3@example.com"\n',
+                content_type="application/x-ndjson",
+            )
+            content = b"".join(response.streaming_content)
+
+        assert [json.loads(line) for line in content.splitlines()] == [
+            {"one@example.com": "invited"},
+            {"two@example.com": "invited"},
+            {"error": "rate limited", "retry_after": 1},
+        ]
+
+    def test_send_invite(self, settings, user_a):
+        settings.INVITATIONS_INVITER_RATE = 0.01
+        self.client.login(username="flibble", password="password")
+        for email in ["one@example.com", "two@example.com"]:
+            self.client.post(reverse("invitations:send-invite"), {"email": email})
+        response = self.client.post(
+            reverse("invitations:send-invite"),
+            {"email": "three@example.com"},
+        )
+
+        assert "Too many invitations, try again in" in str(
+            response.context_data["form"].errors,
+        )
+        assert Invitation.objects.count() == 2
+
+
+@pytest.mark.django_db
+class TestInvitationsMetrics:
+    client = Client()
+
+    @pytest.fixture(autouse=True)
+    def use_metrics(self, settings):
+        settings.INVITATIONS_METRICS_COLLECTOR = "invitations.metrics.InMemoryCollector"
+
+    def test_render(self):
+        collector = metrics.InMemoryCollector()
+        collector.increment("invitations_sent_total", 2)
+        collector.increment("invitations_rejected_total", reason='say "hi"')
+        collector.observe("invitations_send_seconds", 0.003)
+        collector.observe("invitations_send_seconds", 20)
+
+        output = collector.render()
+        assert "# TYPE invitations_sent_total counter\ninvitations_sent_total 2\n" in (
+            output
+        )
+        assert 'invitations_rejected_total{reason="say \\"hi\\""} 1' in output
+        assert 'invitations_send_seconds_bucket{le="0.001"} 0' in output
+        assert 'invitations_send_seconds_bucket{le="0.005"} 1' in output
+        assert 'invitations_send_seconds_bucket{le="10"} 1' in output
+        assert 'invitations_send_seconds_bucket{le="+Inf"} 2' in output
+        assert "invitations_send_seconds_count 2" in output
+
+    def test_disabled(self, settings):
+        settings.INVITATIONS_METRICS_COLLECTOR = None
+        assert metrics.get_collector() is None
+        with metrics.timer("invitations_send_seconds"):
+            metrics.increment("invitations_sent_total")
+
+        request = RequestFactory().get("/metrics/")
+        with pytest.raises(Http404):
+            InvitationMetrics.as_view()(request)
+
+    def test_invite_and_accept(self, settings, user_a, accepted_invitation):
+        settings.INVITATIONS_ALLOW_JSON_INVITES = True
+        settings.INVITATIONS_SIGNUP_REDIRECT = "/non-existent-url/"
+        self.client.login(username="flibble", password="password")
+        self.client.post(
+            reverse("invitations:send-json-invite"),
+            data=json.dumps(["new@example.com", "invalid", accepted_invitation.email]),
+            content_type="application/json",
+        )
+        invitation = Invitation.objects.get(email="new@example.com")
+        url = reverse(
+            app_settings.CONFIRMATION_URL_NAME, kwargs={"key": invitation.key}
+        )
+        self.client.get(url)
+        self.client.get(url)
+
+        response = InvitationMetrics.as_view()(RequestFactory().get("/metrics/"))
+        assert response["Content-Type"].startswith("text/plain; version=0.0.4")
+        output = response.content.decode()
+        for line in [
+            "invitations_created_total 1",
+            "invitations_sent_total 1",
+            "invitations_accepted_total 1",
+            'invitations_rejected_total{reason="accepted",stage="accept"} 1',
+            'invitations_rejected_total{reason="accepted",stage="invite"} 1',
+            'invitations_rejected_total{reason="invalid",stage="invite"} 1',
+            "invitations_render_seconds_count 1",
+            "invitations_send_seconds_count 1",
+            "invitations_lookup_seconds_count 2",
+            "invitations_accept_seconds_count 2",
+        ]:
+            assert f"{line}\n" in output
+
+
+@pytest.mark.django_db
+class TestInvitationsTracing:
+    client = Client()
+
+    @pytest.fixture(autouse=True)
+    def use_tracer(self, settings):
+        settings.INVITATIONS_TRACER = "invitations.tracing.LoggingTracer"
+
+    def get_spans(self, caplog):
+        spans = {}
+        for record in caplog.records:
+            if record.name == "invitations.tracing":
+                span = json.loads(record.getMessage())
+                spans.setdefault(span["name"], span)
+        return spans
+
+    def test_send_invite(self, caplog, user_a):
+        caplog.set_level("INFO", logger="invitations.tracing")
+        self.client.login(username="flibble", password="password")
+        self.client.post(
+            reverse("invitations:send-invite"),
+            {"email": "email@example.com"},
+        )
+
+        spans = self.get_spans(caplog)
+        for name, parent in [
+            ("invitations.validate_invitations", "invitations.send_invite"),
+            ("invitations.send_invitation", "invitations.send_invite"),
+            ("invitations.send_mail", "invitations.send_invitation"),
+            ("invitations.render_mail", "invitations.send_mail"),
+            ("invitations.send_message", "invitations.send_mail"),
+            ("invitations.invite_url_sent", "invitations.send_invitation"),
+        ]:
+            assert spans[name]["parent_id"] == spans[parent]["span_id"]
+            assert spans[name]["trace_id"] == spans[parent]["trace_id"]
+        assert spans["invitations.send_invite"]["parent_id"] is None
+        assert spans["invitations.send_invite"]["duration"] >= (
+            spans["invitations.send_invitation"]["duration"]
+        )
+
+    def test_error(self, caplog):
+        caplog.set_level("INFO", logger="invitations.tracing")
+        with pytest.raises(ValueError):
+            with tracing.span("outer", size=2):
+                raise ValueError("boom")
+
+        span = self.get_spans(caplog)["outer"]
+        assert span["attributes"] == {"size": 2}
+        assert span["error"] == "ValueError('boom')"
+
+    def test_disabled(self, settings, caplog):
+        settings.INVITATIONS_TRACER = None
+        caplog.set_level("INFO", logger="invitations.tracing")
+        with tracing.span("outer"):
+            pass
+        assert tracing.get_tracer() is None
+        assert not caplog.records
+
+
+@pytest.mark.django_db
+class TestImportInvitations:
+    def test_import_csv(self, tmp_path, accepted_invitation):
+        path = tmp_path / "invites.csv"
+        path.write_text(
+            "name,email\n"
+            "One,one@example.com\n"
+            "Invalid,xample.com\n"
+            "Accepted,Accepted@example.com\n"
+            "Two,two@example.com\n"
+            "Three,three@example.com\n",
+        )
+        out = StringIO()
+        call_command(
+            "import_invitations",
+            str(path),
+            "--batch-size=2",
+            stdout=out,
+            stderr=StringIO(),
+        )
+
+        assert (
+            out.getvalue()
+            .splitlines()[-1]
+            .startswith(
+                "3 invitations created, 1 skipped, 1 invalid, 0 failed up to line 6",
+            )
+        )
+        assert set(Invitation.objects.values_list("email", flat=True)) == {
+            "accepted@example.com",
+            "one@example.com",
+            "two@example.com",
+            "three@example.com",
+        }
+        assert len(mail.outbox) == 0
+
+    def test_import_ndjson_send(self, tmp_path, user_a):
+        path = tmp_path / "invites.ndjson"
+        path.write_text(
+            '"one@example.com"\n'
+            "\n"
+            '{"email": "two@example.com"}\n'
+            "not json\n"
+            '"three@example.com"\n',
+        )
+        call_command(
+            "import_invitations",
+            str(path),
+            "--send",
+            "--inviter=flibble",
+            "--start-line=3",
+            stdout=StringIO(),
+            stderr=StringIO(),
+        )
+
+        invitations = Invitation.objects.order_by("email")
+        assert [invitation.email for invitation in invitations] == [
+            "three@example.com",
+            "two@example.com",
+        ]
+        assert all(invitation.inviter == user_a for invitation in invitations)
+        assert all(invitation.sent for invitation in invitations)
+        assert len(mail.outbox) == 2
+        assert "https://example.com/invitations/accept-invite/" in mail.outbox[0].body
+
+    def test_import_send_failure(self, tmp_path):
+        path = tmp_path / "invites.csv"
+        path.write_text("email\none@example.com\n")
+        stderr = StringIO()
+        with patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=ConnectionRefusedError("relay down"),
+        ):
+            call_command(
+                "import_invitations",
+                str(path),
+                "--send",
+                stdout=StringIO(),
+                stderr=stderr,
+            )
+
+        assert "Sending to one@example.com failed: relay down" in stderr.getvalue()
+        # Deleted, so the address can be imported again.
+        assert not Invitation.objects.exists()
+
+        out = StringIO()
+        call_command("import_invitations", str(path), "--send", stdout=out)
+        assert "1 invitations created" in out.getvalue()
+        assert len(mail.outbox) == 1
+
+    def test_import_send_resumes_unsent(self, tmp_path):
+        # Left unsent by an import interrupted before sending.
+        Invitation.create("one@example.com")
+        path = tmp_path / "invites.csv"
+        path.write_text("email\none@example.com\n")
+        call_command("import_invitations", str(path), "--send", stdout=StringIO())
+
+        assert Invitation.objects.get().sent
+        assert len(mail.outbox) == 1
+
+    def test_import_dry_run(self, tmp_path):
+        path = tmp_path / "invites.csv"
+        path.write_text("email\none@example.com\n")
+        out = StringIO()
+        call_command("import_invitations", str(path), "--dry-run", stdout=out)
+
+        assert "1 invitations would be created" in out.getvalue()
+        assert not Invitation.objects.exists()
+
+
+@pytest.mark.django_db
+@pytest.mark.urls("tests.async_urls")
+class TestInvitationsAsyncViews:
+    client = AsyncClient()
+
+    @pytest.fixture(autouse=True)
+    def logout(self):
+        yield
+        self.client.logout()
+
+    def test_accept_invite(self, settings, sent_invitation_by_user_a):
+        settings.INVITATIONS_SIGNUP_REDIRECT = "/non-existent-url/"
+        resp = async_to_sync(self.client.get)(
+            reverse(
+                app_settings.CONFIRMATION_URL_NAME,
+                kwargs={"key": sent_invitation_by_user_a.key},
+            ),
+        )
+
+        assert resp.status_code == 302
+        assert resp.url == "/non-existent-url/"
+        assert self.client.session["account_verified_email"] == (
+            sent_invitation_by_user_a.email
+        )
+        sent_invitation_by_user_a.refresh_from_db()
+        assert sent_invitation_by_user_a.accepted is True
+
+    def test_accept_invite_invalid_key(self):
+        resp = async_to_sync(self.client.get)(
+            reverse(app_settings.CONFIRMATION_URL_NAME, kwargs={"key": "invalidKey"}),
+        )
+
+        assert resp.status_code == 410
+
+    def test_send_invite_auth(self):
+        resp = async_to_sync(self.client.post)(
+            reverse("invitations:send-invite"),
+            {"email": "valid@example.com"},
+        )
+
+        assert resp.status_code == 302
+        assert not Invitation.objects.exists()
+
+    def test_send_invite(self, user_a):
+        self.client.force_login(user_a)
+        resp = async_to_sync(self.client.post)(
+            reverse("invitations:send-invite"),
+            {"email": "valid@example.com"},
+        )
+
+        assert resp.status_code == 200
+        assert (
+            "valid@example.com has been invited" in resp.context_data["success_message"]
+        )
+        invitation = Invitation.objects.get(email="valid@example.com")
+        assert invitation.inviter == user_a
+        assert invitation.sent is not None
+        assert len(mail.outbox) == 1
+
+    def test_send_invite_invalid(self, user_a, invitation_b):
+        self.client.force_login(user_a)
+        resp = async_to_sync(self.client.post)(
+            reverse("invitations:send-invite"),
+            {"email": "invited@example.com"},
+        )
+
+        assert "This e-mail address has already been" in str(
+            resp.context_data["form"].errors,
+        )
+        assert len(mail.outbox) == 0
+
+    def test_send_json_invite(self, settings, user_a, pending_invitation):
+        settings.INVITATIONS_ALLOW_JSON_INVITES = True
+        self.client.force_login(user_a)
+        resp = async_to_sync(self.client.post)(
+            reverse("invitations:send-json-invite"),
+            data=json.dumps(["one@example.com", "pending@example.com"]),
+            content_type="application/json",
+        )
+
+        assert resp.status_code == 201
+        assert json.loads(resp.content.decode()) == {
+            "valid": [{"one@example.com": "invited"}],
+            "invalid": [{"pending@example.com": "pending invite"}],
+        }
+        assert Invitation.objects.get(email="one@example.com").inviter == user_a
+        assert len(mail.outbox) == 1
+
+    def test_send_json_invite_expired(self, settings, user_a):
+        settings.INVITATIONS_ALLOW_JSON_INVITES = True
+        expired = Invitation.create("expired@example.com")
+        expired.sent = timezone.now() - datetime.timedelta(
+            days=app_settings.INVITATION_EXPIRY + 1,
+        )
+        expired.save()
+        self.client.force_login(user_a)
+        resp = async_to_sync(self.client.post)(
+            reverse("invitations:send-json-invite"),
+            data=json.dumps(["one@example.com", "expired@example.com"]),
+            content_type="application/json",
+        )
+
+        assert resp.status_code == 201
+        assert json.loads(resp.content.decode()) == {
+            "valid": [{"one@example.com": "invited"}],
+            "invalid": [{"expired@example.com": "pending invite"}],
+        }
+        assert not Invitation.objects.filter(sent__isnull=True).exists()
+
+    def test_send_invite_with_legacy_form(self, user_a):
+        self.client.force_login(user_a)
+        with patch.object(SendInvite, "form_class", LegacyInviteForm):
+            resp = async_to_sync(self.client.post)(
+                reverse("invitations:send-invite"),
+                {"email": "valid@example.com"},
+            )
+
+        assert "success_message" in resp.context_data
+        assert Invitation.objects.get().inviter == user_a
+        assert len(mail.outbox) == 1
+
+    def test_send_invite_outbox(self, settings, user_a):
+        settings.INVITATIONS_USE_EMAIL_OUTBOX = True
+        self.client.force_login(user_a)
+        with patch.object(
+            PendingInvitationEmail.objects,
+            "create",
+            side_effect=IntegrityError,
+        ):
+            resp = async_to_sync(self.client.post)(
+                reverse("invitations:send-invite"),
+                {"email": "valid@example.com"},
+            )
+
+        # The invitation is rolled back with its queued e-mail.
+        assert "success_message" not in resp.context_data
+        assert not Invitation.objects.exists()
+
+        async_to_sync(self.client.post)(
+            reverse("invitations:send-invite"),
+            {"email": "valid@example.com"},
+        )
+        assert PendingInvitationEmail.objects.get().invitation.email == (
+            "valid@example.com"
+        )
+        assert len(mail.outbox) == 0
+
+    def test_send_json_invite_ndjson(self, settings, user_a):
+        settings.INVITATIONS_ALLOW_JSON_INVITES = True
+        self.client.force_login(user_a)
+
+        async def post():
+            response = await self.client.post(
+                reverse("invitations:send-json-invite"),
+                data='"one@example.com"\n"xample.com"\n',
+                content_type="application/x-ndjson",
+            )
+            return [json.loads(line) async for line in response.streaming_content]
+
+        assert async_to_sync(post)() == [
+            {"one@example.com": "invited"},
+            {"xample.com": "invalid email"},
+        ]
+        assert len(mail.outbox) == 1
+
+
 class TestInvitationSignals:
     client = Client()
 
@@ -410,6 +1486,30 @@ class TestInvitationSignals:
         assert mock_signal.call_args[1]["email"] == "email@example.com"
         assert mock_signal.call_args[1]["sender"] == AcceptInvite
 
+    @patch("invitations.signals.invite_accepted.send")
+    def test_invite_accepted_concurrently(
+        self,
+        mock_signal,
+        sent_invitation_by_user_a,
+    ):
+        # The invitation is accepted between the lookup and the UPDATE.
+        sent_invitation_by_user_a.accept()
+        sent_invitation_by_user_a.accepted = False
+        with patch.object(
+            AcceptInvite,
+            "get_object",
+            return_value=sent_invitation_by_user_a,
+        ):
+            resp = self.client.post(
+                reverse(
+                    app_settings.CONFIRMATION_URL_NAME,
+                    kwargs={"key": sent_invitation_by_user_a.key},
+                ),
+            )
+
+        assert resp.status_code == 410
+        assert not mock_signal.called
+
 
 class TestInvitationsForm:
     @pytest.mark.parametrize(
@@ -437,6 +1537,32 @@ class TestInvitationsForm:
             assert form.errors == {}
         assert form.is_valid() is form_validity
 
+    def test_validate_invitations(
+        self,
+        django_assert_num_queries,
+        accepted_invitation,
+        pending_invitation,
+        expired_invitation,
+        user_b,
+    ):
+        emails = [
+            "bogger@example.com",
+            "Accepted@example.com",
+            "pending@example.com",
+            "expired@example.com",
+            "flobble@example.com",
+        ]
+        with django_assert_num_queries(3):
+            results = CleanEmailMixin().validate_invitations(emails)
+
+        assert results == {
+            "bogger@example.com": True,
+            "Accepted@example.com": AlreadyAccepted,
+            "pending@example.com": AlreadyInvited,
+            "expired@example.com": True,
+            "flobble@example.com": UserRegisteredEmail,
+        }
+
 
 @pytest.mark.django_db
 class TestInvitationsManager:
@@ -461,6 +1587,137 @@ class TestInvitationsManager:
         remaining_invites = Invitation.objects.all().values_list("email", flat=True)
         assert sorted(valid) == sorted(remaining_invites)
 
+    def test_delete_expired_in_batches(
+        self,
+        sent_invitation_by_user_a,
+        accepted_invitation,
+        expired_invitation,
+    ):
+        with patch("invitations.managers.time.sleep") as mock_sleep:
+            deleted = Invitation.objects.delete_expired_confirmations(
+                batch_size=1,
+                sleep=0.5,
+            )
+
+        # Paused once after each single-row batch.
+        assert mock_sleep.call_count == 2
+        assert deleted == 2
+        assert list(Invitation.objects.values_list("email", flat=True)) == [
+            "email@example.com",
+        ]
+
+    def test_delete_expired_rechecks_expiry(self, expired_invitation):
+        def resend(count):
+            # Resent between the selection and the deletion of its batch.
+            Invitation.objects.filter(pk=expired_invitation.pk).update(
+                sent=timezone.now(),
+            )
+
+        with patch("invitations.managers._RowBudget.give_back", side_effect=resend):
+            deleted = Invitation.objects.delete_expired_confirmations()
+
+        assert deleted == 0
+        assert Invitation.objects.filter(pk=expired_invitation.pk).exists()
+
+    def test_delete_expired_max_rows(self, accepted_invitation, expired_invitation):
+        deleted = Invitation.objects.delete_expired_confirmations(max_rows=1)
+
+        assert deleted == 1
+        assert Invitation.objects.count() == 1
+
+    @pytest.mark.django_db(transaction=True)
+    def test_delete_expired_workers(self, accepted_invitation, expired_invitation):
+        # SQLite's shared in-memory database can't take concurrent writers, so
+        # the ranges are purged one thread at a time.
+        with patch(
+            "invitations.managers.ThreadPoolExecutor",
+            lambda max_workers: ThreadPoolExecutor(max_workers=1),
+        ):
+            deleted = Invitation.objects.delete_expired_confirmations(
+                batch_size=1,
+                workers=2,
+            )
+
+        assert deleted == 2
+        assert not Invitation.objects.exists()
+
+    def test_clear_expired_invitations_command(
+        self,
+        accepted_invitation,
+        expired_invitation,
+    ):
+        out = StringIO()
+        call_command("clear_expired_invitations", "--dry-run", stdout=out)
+        assert out.getvalue() == "2 invitations would be deleted.\n"
+        assert Invitation.objects.count() == 2
+
+        out = StringIO()
+        call_command("clear_expired_invitations", "--batch-size=1", stdout=out)
+        assert out.getvalue() == "Deleted 2 invitations.\n"
+        assert not Invitation.objects.exists()
+
+    def test_bulk_create_invitations(
+        self,
+        user_a,
+        accepted_invitation,
+        pending_invitation,
+        user_b,
+    ):
+        results = Invitation.bulk_create_invitations(
+            [
+                "new@example.com",
+                " New@Example.com",
+                "Pending@example.com",
+                "accepted@example.com",
+                "flobble@example.com",
+            ],
+            inviter=user_a,
+        )
+
+        assert results == {
+            "new@example.com": INVITATION_CREATED,
+            "pending@example.com": INVITATION_PENDING,
+            "accepted@example.com": INVITATION_ACCEPTED,
+            "flobble@example.com": INVITATION_REGISTERED,
+        }
+        invite = Invitation.objects.get(email="new@example.com")
+        assert invite.inviter == user_a
+        assert len(invite.key) == 64
+
+    def test_bulk_create_invitations_concurrent_insert(self, user_a):
+        def insert_concurrently(*keys):
+            add_keys.side_effect = None
+            Invitation.create("new@example.com")
+
+        # A concurrent request inserts the address after it was checked.
+        with patch("invitations.key_filter.add_keys") as add_keys:
+            add_keys.side_effect = insert_concurrently
+            results, invitations = Invitation.bulk_create_invitations(
+                ["new@example.com", "other@example.com"],
+                inviter=user_a,
+                return_invitations=True,
+            )
+
+        assert results == {
+            "new@example.com": INVITATION_PENDING,
+            "other@example.com": INVITATION_CREATED,
+        }
+        assert list(invitations) == ["other@example.com"]
+        assert invitations["other@example.com"].pk is not None
+        assert invitations["other@example.com"].inviter == user_a
+        assert Invitation.objects.get(email="new@example.com").inviter is None
+
+    def test_bulk_create_invitations_batches_queries(
+        self,
+        django_assert_max_num_queries,
+    ):
+        emails = [f"user{i}@example.com" for i in range(100)]
+        with django_assert_max_num_queries(12):
+            results = Invitation.bulk_create_invitations(emails, batch_size=50)
+
+        assert set(results.values()) == {INVITATION_CREATED}
+        assert Invitation.objects.count() == 100
+
 
 class TestInvitationsJSON:
     client = Client()
@@ -524,6 +1781,124 @@ class TestInvitationsJSON:
         assert response.status_code == status_code
         assert json.loads(response.content.decode()) == expected
 
+    def test_post_many(self, settings, user_a, accepted_invitation):
+        settings.INVITATIONS_ALLOW_JSON_INVITES = True
+        self.client.login(username="flibble", password="password")
+        response = self.client.post(
+            reverse("invitations:send-json-invite"),
+            data=json.dumps(
+                [
+                    "one@example.com",
+                    "xample.com",
+                    "One@example.com",
+                    "accepted@example.com",
+                    "two@example.com",
+                ],
+            ),
+            content_type="application/json",
+        )
+
+        assert response.status_code == 201
+        assert json.loads(response.content.decode()) == {
+            "valid": [{"one@example.com": "invited"}, {"two@example.com": "invited"}],
+            "invalid": [
+                {"xample.com": "invalid email"},
+                {"One@example.com": "pending invite"},
+                {"accepted@example.com": "already accepted"},
+            ],
+        }
+        assert len(mail.outbox) == 2
+
+    def test_post_many_send_failure(self, settings, user_a):
+        settings.INVITATIONS_ALLOW_JSON_INVITES = True
+        self.client.login(username="flibble", password="password")
+        with patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=[1, ConnectionRefusedError],
+        ):
+            response = self.client.post(
+                reverse("invitations:send-json-invite"),
+                data=json.dumps(["one@example.com", "two@example.com"]),
+                content_type="application/json",
+            )
+
+        assert response.status_code == 201
+        assert json.loads(response.content.decode()) == {
+            "valid": [{"one@example.com": "invited"}],
+            "invalid": [{"two@example.com": "sending failed"}],
+        }
+        assert list(Invitation.objects.values_list("email", flat=True)) == [
+            "one@example.com",
+        ]
+        assert Invitation.objects.get().sent
+
+    @pytest.mark.django_db(transaction=True)
+    def test_post_many_sends_after_commit(self, settings, user_a):
+        settings.INVITATIONS_ALLOW_JSON_INVITES = True
+        self.client.login(username="flibble", password="password")
+        send_mails = BaseInvitationsAdapter.send_mails
+
+        def check_committed(adapter, mails):
+            assert not connection.in_atomic_block
+            assert Invitation.objects.count() == 2
+            return send_mails(adapter, mails)
+
+        with patch.object(BaseInvitationsAdapter, "send_mails", check_committed):
+            response = self.client.post(
+                reverse("invitations:send-json-invite"),
+                data=json.dumps(["one@example.com", "two@example.com"]),
+                content_type="application/json",
+            )
+
+        assert response.status_code == 201
+        assert len(mail.outbox) == 2
+
+    def test_post_ndjson(self, settings, user_a, pending_invitation):
+        settings.INVITATIONS_ALLOW_JSON_INVITES = True
+        self.client.login(username="flibble", password="password")
+        lines = [
+            '"one@example.com"',
+            '"xample.com"',
+            '"pending@example.com"',
+            "",
+            "not json",
+            '"One@example.com"',
+        ]
+        with patch.object(SendJSONInvite, "stream_batch_size", 2):
+            response = self.client.post(
+                reverse("invitations:send-json-invite"),
+                data="\n".join(lines),
+                content_type="application/x-ndjson",
+            )
+            content = b"".join(response.streaming_content)
+
+        assert response.status_code == 200
+        assert [json.loads(line) for line in content.splitlines()] == [
+            {"one@example.com": "invited"},
+            {"xample.com": "invalid email"},
+            {"pending@example.com": "pending invite"},
+            {"not json": "invalid email"},
+            {"One@example.com": "pending invite"},
+        ]
+        assert len(mail.outbox) == 1
+
+    @pytest.mark.parametrize(
+        "content_type",
+        ["application/json", "application/x-ndjson"],
+    )
+    def test_post_too_large(self, settings, user_a, content_type):
+        settings.INVITATIONS_ALLOW_JSON_INVITES = True
+        settings.INVITATIONS_JSON_MAX_PAYLOAD_SIZE = 10
+        self.client.login(username="flibble", password="password")
+        response = self.client.post(
+            reverse("invitations:send-json-invite"),
+            data=json.dumps(["example@example.com"]),
+            content_type=content_type,
+        )
+
+        assert response.status_code == 413
+        assert not Invitation.objects.exists()
+
     def test_json_setting(self, user_a):
         self.client.login(username="flibble", password="password")
         response = self.client.post(
@@ -584,3 +1959,139 @@ class TestInvitationsAdmin:
         fields = list(response.context_data["adminform"].form.fields.keys())
         expected_fields = ["accepted", "key", "sent", "inviter", "email", "created"]
         assert fields == expected_fields
+
+    def test_changelist_search(self, super_user, invitation_a, invitation_b):
+        self.client.login(username="flibble", password="password")
+        response = self.client.get(
+            reverse("admin:invitations_invitation_changelist"),
+            {"q": " Invited@"},
+        )
+
+        assert response.status_code == 200
+        assert list(response.context_data["cl"].result_list) == [invitation_b]
+
+    @pytest.mark.parametrize(
+        "expired, expected",
+        [("1", ["expired@example.com"]), ("0", ["pending@example.com"])],
+    )
+    def test_changelist_expired_filter(self, super_user, expired, expected):
+        for email, days, accepted in [
+            ("pending@example.com", 1, False),
+            ("expired@example.com", app_settings.INVITATION_EXPIRY + 1, False),
+            ("accepted@example.com", 1, True),
+        ]:
+            Invitation.create(
+                email,
+                sent=timezone.now() - datetime.timedelta(days=days),
+                accepted=accepted,
+            )
+        self.client.login(username="flibble", password="password")
+        response = self.client.get(
+            reverse("admin:invitations_invitation_changelist"),
+            {"expired": expired},
+        )
+
+        cl = response.context_data["cl"]
+        assert [invitation.email for invitation in cl.result_list] == expected
+
+    def test_changelist_estimated_count(self, super_user, invitation_b):
+        self.client.login(username="flibble", password="password")
+        with patch.object(
+            EstimatedCountPaginator,
+            "get_estimated_count",
+            return_value=500000,
+        ):
+            response = self.client.get(
+                reverse("admin:invitations_invitation_changelist"),
+            )
+            assert response.context_data["cl"].result_count == 500000
+
+            response = self.client.get(
+                reverse("admin:invitations_invitation_changelist"),
+                {"accepted__exact": "0"},
+            )
+            assert response.context_data["cl"].result_count == 1
+
+    def test_resend_action(self, super_user, invitation_b):
+        Invitation.create("accepted@example.com", accepted=True)
+        self.client.login(username="flibble", password="password")
+        with patch.object(InvitationAdmin, "resend_batch_size", 1):
+            response = self.client.post(
+                reverse("admin:invitations_invitation_changelist"),
+                {
+                    "action": "resend_invitations",
+                    "_selected_action": Invitation.objects.values_list(
+                        "pk",
+                        flat=True,
+                    ),
+                },
+                follow=True,
+            )
+
+        assert "Resent 1 invitation." in response.content.decode()
+        assert [message.to for message in mail.outbox] == [["invited@example.com"]]
+        invitation_b.refresh_from_db()
+        assert invitation_b.sent
+
+    def test_resend_action_reissues_signed_keys(self, settings, super_user):
+        settings.INVITATIONS_SIGNED_KEYS = True
+        with freeze_time("2015-07-30 12:00:06"):
+            invitation = Invitation.create("email@example.com", sent=timezone.now())
+        old_key = invitation.key
+        self.client.login(username="flibble", password="password")
+        self.client.post(
+            reverse("admin:invitations_invitation_changelist"),
+            {"action": "resend_invitations", "_selected_action": [invitation.pk]},
+        )
+        invitation.refresh_from_db()
+
+        assert invitation.key != old_key
+        assert not invitation.key_expired()
+        assert invitation.key in mail.outbox[0].body
+
+    def test_resend_action_reissues_queued_signed_keys(self, settings, super_user):
+        settings.INVITATIONS_SIGNED_KEYS = True
+        settings.INVITATIONS_USE_EMAIL_OUTBOX = True
+        invitation = Invitation.create("email@example.com")
+        invitation.send_invitation(RequestFactory().get("/"))
+        self.client.login(username="flibble", password="password")
+        self.client.post(
+            reverse("admin:invitations_invitation_changelist"),
+            {"action": "resend_invitations", "_selected_action": [invitation.pk]},
+        )
+        invitation.refresh_from_db()
+        PendingInvitationEmail.objects.send_pending()
+
+        # The e-mail queued with the old key was dropped.
+        assert len(mail.outbox) == 1
+        assert invitation.key in mail.outbox[0].body
+
+    def test_expire_action(self, super_user):
+        invitation = Invitation.create("email@example.com", sent=timezone.now())
+        self.client.login(username="flibble", password="password")
+        self.client.post(
+            reverse("admin:invitations_invitation_changelist"),
+            {
+                "action": "expire_invitations",
+                "_selected_action": [invitation.pk],
+            },
+        )
+
+        invitation.refresh_from_db()
+        assert invitation.key_expired()
+
+    def test_delete_action(self, settings, super_user, invitation_b):
+        settings.INVITATIONS_STATE_CACHE = "default"
+        state_cache.set_state(invitation_b)
+        self.client.login(username="flibble", password="password")
+        self.client.post(
+            reverse("admin:invitations_invitation_changelist"),
+            {
+                "action": "delete_selected",
+                "_selected_action": [invitation_b.pk],
+                "post": "yes",
+            },
+        )
+
+        assert not Invitation.objects.exists()
+        assert state_cache.get_state(invitation_b.key) is None
@@ -0,0 +1,152 @@
+"""
+Runs the benchmarks of ``bench_invitations`` on an in-memory SQLite test
+database, writes their timings as JSON and compares them to a baseline::
+
+    python -m tests.benchmarks --output results.json --baseline baseline.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(prog="python -m tests.benchmarks")
+    parser.add_argument(
+        "names",
+        nargs="*",
+        help="Benchmarks to run, all of them by default.",
+    )
+    parser.add_argument(
+        "--output",
+        default="benchmark-results.json",
+        help="File the results are written to.",
+    )
+    parser.add_argument(
+        "--baseline",
+        help="Results of an earlier run to compare to.",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Slowdown relative to the baseline reported as a regression.",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="Number of timed runs of each benchmark and size.",
+    )
+    parser.add_argument(
+        "--max-size",
+        type=int,
+        help="Skip the sizes above this one, for a quicker run.",
+    )
+    return parser
+
+
+def setup_django():
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "test_settings")
+    import django
+    from django.conf import settings
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    django.setup()
+    if connection.vendor != "sqlite":
+        sys.exit("The benchmarks run on SQLite.")
+    settings.EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+
+def time_benchmark(benchmark, size, repeat):
+    from django.db import transaction
+
+    timings = []
+    with benchmark.settings(), transaction.atomic():
+        benchmark.setup(size)
+        for _ in range(repeat):
+            with transaction.atomic():
+                started = time.perf_counter()
+                benchmark.run(size)
+                timings.append(time.perf_counter() - started)
+                transaction.set_rollback(True)
+        transaction.set_rollback(True)
+    return {
+        "size": size,
+        "repeat": repeat,
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.mean(timings),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """
+    Prints the change of the median timings from `baseline`, and returns
+    the names of the benchmarks that slowed down by more than `tolerance`.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        ratio = result["median"] / baseline[name]["median"]
+        flag = ""
+        if ratio > 1 + tolerance:
+            regressions.append(name)
+            flag = "  REGRESSION"
+        print(f"{name:45} {ratio - 1:+8.1%}{flag}")
+    return regressions
+
+
+def main(argv=None):
+    options = get_parser().parse_args(argv)
+    setup_django()
+    import django
+
+    from .bench_invitations import BENCHMARKS
+
+    names = options.names or list(BENCHMARKS)
+    unknown = set(names) - set(BENCHMARKS)
+    if unknown:
+        sys.exit(f"Unknown benchmarks: {', '.join(sorted(unknown))}")
+
+    results = {}
+    for name in names:
+        benchmark = BENCHMARKS[name]()
+        for size in benchmark.sizes:
+            if options.max_size is not None and size > options.max_size:
+                continue
+            key = f"{name}[{size}]"
+            results[key] = time_benchmark(benchmark, size, options.repeat)
+            print(f"{key:45} {results[key]['median'] * 1000:10.2f} ms")
+
+    with open(options.output, "w") as f:
+        json.dump(
+            {
+                "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "results": results,
+            },
+            f,
+            indent=2,
+        )
+
+    if options.baseline:
+        with open(options.baseline) as f:
+            baseline = json.load(f)["results"]
+        print(f"Change of the median timings since {options.baseline}:")
+        if compare(results, baseline, options.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Benchmarks of the hot paths of the package, run by ``python -m
+tests.benchmarks``.
+"""
+
+import datetime
+import json
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from invitations.adapters import get_invitations_adapter
+from invitations.app_settings import app_settings
+from invitations.exceptions import AlreadyInvited
+from invitations.forms import CleanEmailMixin
+from invitations.keys import generate_key
+from invitations.utils import get_invitation_model
+
+Invitation = get_invitation_model()
+
+
+class Benchmark:
+    """
+    `setup` prepares the rows needed for one of the `sizes`, then `run` is
+    timed in a transaction rolled back after each repetition, so all of
+    them start from the same rows. Sizes count the operations or rows
+    involved.
+    """
+
+    sizes = (100,)
+
+    def settings(self):
+        return override_settings()
+
+    def setup(self, size):
+        pass
+
+    def run(self, size):
+        raise NotImplementedError
+
+
+def create_invitations(count, prefix="user", batch_size=10000, **kwargs):
+    emails = (f"{prefix}{i}@example.com" for i in range(count))
+    while batch := list(islice(emails, batch_size)):
+        Invitation.objects.bulk_create(
+            [
+                Invitation(
+                    email=email,
+                    normalized_email=email,
+                    key=generate_key(),
+                    **kwargs,
+                )
+                for email in batch
+            ],
+        )
+
+
+class Create(Benchmark):
+    def run(self, size):
+        for i in range(size):
+            Invitation.create(f"new{i}@example.com")
+
+
+class ValidateInvitation(Benchmark):
+    def setup(self, size):
+        create_invitations(1000)
+
+    def run(self, size):
+        form = CleanEmailMixin()
+        for i in range(size):
+            # Half of the addresses were already invited.
+            try:
+                form.validate_invitation(f"user{i * 20}@example.com")
+            except AlreadyInvited:
+                pass
+
+
+class AcceptInviteGet(Benchmark):
+    method = "get"
+
+    def setup(self, size):
+        create_invitations(size, sent=timezone.now())
+        self.urls = [
+            reverse(app_settings.CONFIRMATION_URL_NAME, kwargs={"key": key})
+            for key in Invitation.objects.values_list("key", flat=True)
+        ]
+        self.client = Client()
+
+    def run(self, size):
+        for url in self.urls:
+            response = getattr(self.client, self.method)(url)
+            assert response.status_code == 302, response.status_code
+
+
+class AcceptInvitePost(AcceptInviteGet):
+    method = "post"
+
+
+class SendJSONInvite(Benchmark):
+    sizes = (10, 1000, 10000)
+
+    def settings(self):
+        return override_settings(
+            INVITATIONS_ALLOW_JSON_INVITES=True,
+            DATA_UPLOAD_MAX_MEMORY_SIZE=None,
+        )
+
+    def setup(self, size):
+        self.client = Client()
+        self.client.force_login(
+            get_user_model().objects.create_user(username="inviter"),
+        )
+        self.data = json.dumps([f"new{i}@example.com" for i in range(size)])
+        mail.outbox = []
+
+    def run(self, size):
+        response = self.client.post(
+            reverse("invitations:send-json-invite"),
+            data=self.data,
+            content_type="application/json",
+        )
+        assert response.status_code == 201, response.status_code
+
+
+class RenderMail(Benchmark):
+    def setup(self, size):
+        invitation = Invitation.create("user@example.com")
+        self.context = invitation.get_email_context(
+            invitation.get_invite_context(None),
+        )
+
+    def run(self, size):
+        adapter = get_invitations_adapter()
+        for _ in range(size):
+            adapter.render_mail(
+                Invitation.email_template,
+                "user@example.com",
+                self.context,
+            )
+
+
+class DeleteExpiredConfirmations(Benchmark):
+    sizes = (10000, 100000, 1000000)
+
+    def setup(self, size):
+        # Half of the invitations are expired.
+        expired = timezone.now() - datetime.timedelta(
+            days=app_settings.INVITATION_EXPIRY + 1,
+        )
+        create_invitations(size // 2, prefix="expired", sent=expired)
+        create_invitations(size - size // 2, prefix="pending", sent=timezone.now())
+
+    def run(self, size):
+        assert Invitation.objects.delete_expired_confirmations() == size // 2
+
+
+BENCHMARKS = {
+    "create": Create,
+    "validate_invitation": ValidateInvitation,
+    "accept_invite_get": AcceptInviteGet,
+    "accept_invite_post": AcceptInvitePost,
+    "send_json_invite": SendJSONInvite,
+    "render_mail": RenderMail,
+    "delete_expired_confirmations": DeleteExpiredConfirmations,
+}